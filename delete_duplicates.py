@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.db.models import Count
 from events.models import Registration
 
@@ -10,8 +11,10 @@ for duplicate in duplicates:
     # Get all duplicate registrations for this event and user
     registrations_to_delete = Registration.objects.filter(event=event_id, user=user_id).order_by('registered_at')
     
-    # Keep the first one, delete the rest
-    for registration in registrations_to_delete[1:]:
-        registration.delete()
+    # Keep the first one, delete the rest. Each delete() fires post_delete, which
+    # decrements Event.registered_count in the same transaction.
+    with transaction.atomic():
+        for registration in registrations_to_delete[1:]:
+            registration.delete()
 
 print("Duplicate registrations removed.")
\ No newline at end of file
@@ -1,7 +1,10 @@
-from events.models import Message
+from django.utils.functional import SimpleLazyObject
+from events.cache import get_unread_count
 
 def unread_message_count(request):
     if request.user.is_authenticated:
-        count = Message.objects.filter(receiver=request.user, is_read=False).count()
+        # Lazy so templates that never show the badge never look the count up
+        user_id = request.user.id
+        count = SimpleLazyObject(lambda: get_unread_count(user_id))
         return {'unread_message_count': count}
     return {'unread_message_count': 0}
@@ -29,6 +29,11 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = 'event_networking.urls'
+ASGI_APPLICATION = 'event_networking.asgi.application'
+
+# Chat push channel (events/realtime.py). The in-process broker only reaches
+# streams held by the same worker; point this at a shared broker when scaling out.
+MESSAGE_BROKER = 'events.realtime.InProcessBroker'
 
 TEMPLATES = [
     {
@@ -54,6 +59,26 @@ DATABASES = {
     }
 }
 
+# The home page cache (events/cache.py) is invalidated by bumping a counter in
+# the cache, so every worker process has to share it. A per-process LocMemCache
+# would keep serving stale listings in all workers but the one that saved.
+# Set REDIS_URL in production; otherwise the database cache is used, whose table
+# is created with `python manage.py createcachetable`.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'events_cache',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -80,6 +105,17 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Defaults for custom-field file answers (events/uploads.py); a CustomField can
+# override both with max_file_size / allowed_file_types.
+REGISTRATION_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+REGISTRATION_UPLOAD_TYPES = ['application/pdf', 'image/jpeg', 'image/png']
+
+# AI feedback summaries (events/summaries.py), generated by
+# `manage.py generate_feedback_summaries`. Set FEEDBACK_SUMMARY_BACKEND to a dotted
+# path to pick a backend; by default the OpenAI one is used when a key is set,
+# and the local extractive one otherwise.
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'login'
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Category, Event, EventRegistration, EventFeedback, Certificate, Message, EventSuggestion
+from .models import User, Category, Event, EventRegistration, EventFeedback, Certificate, Message, EventSuggestion, OutboxEmail, WaitlistEntry, EventDailyStats, FeedbackSummary
 
 class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
@@ -15,7 +15,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ['title', 'organizer', 'category', 'date']
+    list_display = ['title', 'organizer', 'category', 'date', 'registered_count']
     list_filter = ['category', 'date']
     search_fields = ['title', 'description']
 
@@ -44,4 +44,23 @@ class EventSuggestionAdmin(admin.ModelAdmin):
     list_display = ['event', 'participant', 'created_at']
     list_filter = ['created_at']
 
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['event', 'user', 'ticket', 'joined_at']
+    ordering = ['event', 'ticket']
+
+@admin.register(EventDailyStats)
+class EventDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['event', 'day', 'registrations', 'cancellations', 'attendances']
+    list_filter = ['day']
+
+@admin.register(FeedbackSummary)
+class FeedbackSummaryAdmin(admin.ModelAdmin):
+    list_display = ['event', 'backend', 'generated_at', 'requested_at', 'attempts']
+
 admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Normalized custom-field answers.
+
+Registration.responses stays the record of what was submitted.
+RegistrationAnswer repeats each answer as an (event, field, value) row, so the
+registrations page can filter on answers and count them with the
+answer_facet_idx index instead of parsing every registration's JSON.
+"""
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import CustomField, RegistrationAnswer
+
+# Most common values shown per field
+FACET_LIMIT = 10
+
+
+def answer_value(value):
+    """The text indexed for one answer, or None when there is nothing to index."""
+    if isinstance(value, dict):
+        # File answer (uploads.upload_answer)
+        value = value.get('name')
+    elif isinstance(value, list):
+        value = ', '.join(map(str, value))
+    if value is None:
+        return None
+    return str(value).strip()[:RegistrationAnswer.VALUE_LENGTH] or None
+
+
+def build_answers(registration, field_ids):
+    """Answer rows for `registration`; `field_ids` maps each CustomField label to its id."""
+    answers = []
+    for label, value in (registration.responses or {}).items():
+        text = answer_value(value)
+        if label in field_ids and text is not None:
+            answers.append(RegistrationAnswer(
+                registration_id=registration.pk, event_id=registration.event_id,
+                field_id=field_ids[label], value=text,
+            ))
+    return answers
+
+
+def record_answers(registration, schema=None):
+    """
+    Index a newly saved registration's responses. Pass the event's CustomFields
+    (e.g. the cached form's .schema) to avoid looking them up again.
+    """
+    if schema is None:
+        schema = CustomField.objects.filter(event_id=registration.event_id)
+    field_ids = {field.label: field.pk for field in schema}
+    RegistrationAnswer.objects.bulk_create(build_answers(registration, field_ids))
+
+
+def answer_filters(params, schema):
+    """(field id, value) pairs from ?answer=<field id>:<value> parameters, for fields of this event."""
+    field_ids = {field.pk for field in schema}
+    filters = []
+    for raw in params.getlist('answer'):
+        field_id, separator, value = raw.partition(':')
+        if separator and field_id.isdigit() and int(field_id) in field_ids:
+            filters.append((int(field_id), value))
+    return filters
+
+
+def filter_by_answers(registrations, event, filters):
+    for field_id, value in filters:
+        registrations = registrations.filter(id__in=RegistrationAnswer.objects.filter(
+            event=event, field_id=field_id, value=value
+        ).values('registration_id'))
+    return registrations
+
+
+def facet_counts(event, registrations=None, limit=FACET_LIMIT):
+    """
+    {field id: [(value, count), ...]}, the `limit` most common values of each
+    field, from a single GROUP BY. Pass a filtered Registration queryset to
+    count only within it.
+    """
+    answers = RegistrationAnswer.objects.filter(event=event)
+    if registrations is not None:
+        answers = answers.filter(registration_id__in=registrations.values('id'))
+    rows = (
+        answers.values('field_id', 'value')
+        .annotate(count=Count('id'))
+        .annotate(rank=Window(RowNumber(), partition_by=F('field_id'), order_by=[F('count').desc(), F('value')]))
+        .filter(rank__lte=limit)
+        .order_by('field_id', 'rank')
+        .values_list('field_id', 'value', 'count')
+    )
+    facets = {}
+    for field_id, value, count in rows:
+        facets.setdefault(field_id, []).append((value, count))
+    return facets
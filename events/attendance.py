@@ -0,0 +1,126 @@
+"""
+Bulk attendance check-in.
+
+Organizers mark attendees either by uploading a sheet (matched on email or
+username) or by posting registration ids. Both paths load the event's
+registrations once, match in memory, and write in chunks inside one
+transaction. Checked-in participants also get an attended EventRegistration,
+which is what feedback and the CV page look at.
+"""
+import csv
+import io
+import itertools
+
+from django.db import connection, transaction
+
+from .models import EventRegistration, Registration, RegistrationActivity
+from .rollups import record_activity
+
+BULK_CHUNK_SIZE = 1000
+# How many unmatched values the summary echoes back
+UNMATCHED_SAMPLE = 50
+
+
+def check_in(event, registration_ids, unmatched):
+    """
+    Mark the given registrations of `event` as attended. `unmatched` is the
+    list of inputs that didn't resolve to a registration; it is only counted
+    and sampled for the summary.
+    """
+    registrations = dict(Registration.objects.filter(event=event).values_list('id', 'attended'))
+    to_mark, already, seen = [], 0, set()
+    for registration_id in registration_ids:
+        if registration_id in seen:
+            continue
+        seen.add(registration_id)
+        if registration_id not in registrations:
+            unmatched.append(registration_id)
+            continue
+        if registrations[registration_id]:
+            already += 1
+        else:
+            to_mark.append(registration_id)
+
+    with transaction.atomic():
+        # Every row gets the same value, so one UPDATE ... WHERE id IN (chunk) per chunk
+        # rather than bulk_update's per-row CASE, which was ~10x slower at 10k rows
+        for start in range(0, len(to_mark), BULK_CHUNK_SIZE):
+            Registration.objects.filter(id__in=to_mark[start:start + BULK_CHUNK_SIZE]).update(attended=True)
+        if to_mark:
+            sync_event_registrations(event.pk)
+            record_activity(event.pk, RegistrationActivity.ATTENDED, len(to_mark))
+
+    return {
+        'matched': len(to_mark),
+        'already_attended': already,
+        'unmatched': len(unmatched),
+        'unmatched_sample': unmatched[:UNMATCHED_SAMPLE],
+    }
+
+
+def sync_event_registrations(event_id, registration_id=None):
+    """
+    Upsert an attended EventRegistration for every attended Registration of
+    the event (or just `registration_id`) in one INSERT ... SELECT, instead
+    of building a model per row.
+    """
+    target, source = EventRegistration._meta.db_table, Registration._meta.db_table
+    params = [True, event_id]
+    only_one = ''
+    if registration_id is not None:
+        only_one = 'AND id = %s'
+        params.append(registration_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {target} (event_id, participant_id, registered_at, attended)
+            SELECT event_id, user_id, registered_at, %s FROM {source}
+            WHERE event_id = %s AND attended {only_one}
+            ON CONFLICT (event_id, participant_id) DO UPDATE SET attended = excluded.attended
+            """,
+            params,
+        )
+
+
+def check_in_by_ids(event, registration_ids):
+    ids, unmatched = [], []
+    for value in registration_ids:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            unmatched.append(value)
+    return check_in(event, ids, unmatched)
+
+
+def check_in_from_csv(event, csv_file):
+    """
+    Check in everyone listed in an uploaded CSV. Values are read from the
+    "email" or "username" column, or from the first column when neither
+    header is present, and may be either an email or a username.
+    """
+    rows = csv.reader(io.TextIOWrapper(csv_file, encoding='utf-8-sig', errors='replace', newline=''))
+    first = next(rows, [])
+    header = [cell.strip().lower() for cell in first]
+    column = next((header.index(name) for name in ('email', 'username') if name in header), None)
+    if column is None:
+        # No recognised header: the first row is data too
+        column, rows = 0, itertools.chain([first], rows)
+
+    # Lowercased email and username -> registration id, one query for the whole event
+    lookup = {}
+    for registration_id, email, username in (
+        Registration.objects.filter(event=event).values_list('id', 'email', 'user__username')
+    ):
+        lookup.setdefault(email.lower(), registration_id)
+        lookup.setdefault(username.lower(), registration_id)
+
+    ids, unmatched = [], []
+    for row in rows:
+        value = row[column].strip() if column < len(row) else ''
+        if not value:
+            continue
+        if value.lower() in lookup:
+            ids.append(lookup[value.lower()])
+        else:
+            unmatched.append(value)
+    return check_in(event, ids, unmatched)
@@ -0,0 +1,175 @@
+"""
+Cached home page data and per-user unread message counters.
+
+Entries are namespaced by a generation number that the Event/Category signals
+bump, so invalidating every category_name variant is a single cache.incr. Event
+entries also expire at the next status transition of any event they contain
+(start, end, or dropping out of the "recently completed" window), so the home
+page rolls over on time even when nothing is edited.
+
+The generation only reaches the workers that share the cache, so the default
+cache must be shared between processes (see CACHES in settings). The
+events.W001 check warns when it is a per-process LocMemCache. The database
+cache's table is created by migration 0050.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Category, Conversation, Event
+
+logger = logging.getLogger(__name__)
+
+HOME_RECENT_HOURS = 5
+HOME_EVENT_LIMIT = 6
+HOME_CACHE_MAX_AGE = 60 * 60
+
+GENERATION_KEY = 'home:generation'
+HITS_KEY = 'home:hits'
+MISSES_KEY = 'home:misses'
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+        return [checks.Warning(
+            'The default cache is per process, so home page invalidation only reaches the worker that saved.',
+            hint='Use a shared cache (Redis, Memcached or the database cache) when running more than one worker.',
+            id='events.W001',
+        )]
+    return []
+
+
+def _new_generation():
+    # Seeded from the clock so an evicted counter can't restart at a value whose
+    # entries are still cached.
+    return int(time.time() * 1000)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _new_generation(), timeout=None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def invalidate_home_cache():
+    """Bump the generation. Called from model signals, so a cache outage is logged rather than failing the save."""
+    try:
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, _new_generation(), timeout=None)
+    except Exception:
+        logger.exception("Could not invalidate the home page cache")
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+
+def _seconds_until_next_transition(events, now):
+    transitions = []
+    for event in events:
+        transitions += [event.start_time, event.end_time, event.end_time + timedelta(hours=HOME_RECENT_HOURS)]
+    upcoming = [t for t in transitions if t > now]
+    if not upcoming:
+        return HOME_CACHE_MAX_AGE
+    seconds = (min(upcoming) - now).total_seconds()
+    return max(1, min(HOME_CACHE_MAX_AGE, int(seconds) + 1))
+
+
+def get_home_events(category_name=None):
+    """The events featured on the home page, optionally limited to one category."""
+    name_key = hashlib.md5((category_name or '').encode()).hexdigest()
+    key = f'home:events:{_generation()}:{name_key}'
+    events = cache.get(key)
+    if events is not None:
+        _count(HITS_KEY)
+        return events
+
+    _count(MISSES_KEY)
+    now = timezone.now()
+    queryset = Event.objects.order_by('date')
+    if category_name:
+        queryset = queryset.filter(category__name=category_name)
+    events = list(queryset.active_or_recent(hours=HOME_RECENT_HOURS, now=now)[:HOME_EVENT_LIMIT])
+    cache.set(key, events, timeout=_seconds_until_next_transition(events, now))
+    return events
+
+
+def get_categories():
+    key = f'home:categories:{_generation()}'
+    categories = cache.get(key)
+    if categories is not None:
+        _count(HITS_KEY)
+        return categories
+
+    _count(MISSES_KEY)
+    categories = list(Category.objects.all())
+    cache.set(key, categories, timeout=HOME_CACHE_MAX_AGE)
+    return categories
+
+
+# Unread message counters. Sends, reads and deletes adjust the cached value in
+# place once they commit. A counter that is missing is recounted from the
+# Conversation table, and every counter expires after UNREAD_COUNT_TTL, which
+# reconciles any drift (a lost update, a cache restart) within that time.
+# `manage.py reconcile_unread_counts` repairs the Conversation counts themselves.
+UNREAD_COUNT_TTL = 5 * 60
+
+
+def _unread_key(user_id):
+    return f'unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    key = _unread_key(user_id)
+    try:
+        count = cache.get(key)
+    except Exception:
+        logger.exception("Could not read the unread count of user %s", user_id)
+        return Conversation.objects.unread_count(user_id)
+    if count is None:
+        count = Conversation.objects.unread_count(user_id)
+        cache.add(key, count, timeout=UNREAD_COUNT_TTL)
+    return count
+
+
+def adjust_unread_count(user_id, delta):
+    """Apply `delta` to a cached counter. One that isn't cached is left to the DB fallback."""
+    key = _unread_key(user_id)
+    try:
+        try:
+            count = cache.incr(key, delta)
+        except ValueError:
+            return
+        if count < 0:
+            cache.delete(key)
+    except Exception:
+        logger.exception("Could not adjust the unread count of user %s", user_id)
+
+
+def forget_unread_counts(user_ids):
+    """Drop cached counters so the next read recounts them."""
+    try:
+        cache.delete_many([_unread_key(user_id) for user_id in user_ids])
+    except Exception:
+        logger.exception("Could not reset cached unread counts")
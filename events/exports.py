@@ -0,0 +1,185 @@
+"""
+Registrant exports for organizers.
+
+Both formats are generators meant for StreamingHttpResponse: the header row
+goes out before the registrations are queried, and rows are read with
+.iterator() and sent a couple of hundred at a time, so memory stays flat
+however many people registered. Custom-field answers become one column per CustomField,
+in the order the fields were created.
+
+XLSX is produced without a spreadsheet library. zipfile writes to an
+unseekable buffer that the generator drains after every few rows, and the
+sheet uses inline strings so there's no shared-strings table to build up.
+"""
+import csv
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import Registration
+
+EXPORT_CHUNK_SIZE = 500
+BASE_COLUMNS = ['Name', 'Email', 'Registered at', 'Attended']
+
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def export_columns(event):
+    return BASE_COLUMNS + list(event.custom_fields.order_by('id').values_list('label', flat=True))
+
+
+def flatten_answer(value):
+    if value is None:
+        return ''
+    if isinstance(value, dict) and ('path' in value or 'name' in value):
+        # File answer (events/uploads.py); older rows only have a name
+        return value.get('path') or value.get('name', '')
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def registration_rows(event, labels, chunk_size=EXPORT_CHUNK_SIZE):
+    registrations = (
+        Registration.objects.filter(event=event)
+        .order_by('registered_at', 'id')
+        .only('name', 'email', 'registered_at', 'attended', 'responses')
+    )
+    for registration in registrations.iterator(chunk_size=chunk_size):
+        responses = registration.responses or {}
+        yield [
+            registration.name,
+            registration.email,
+            timezone.localtime(registration.registered_at).strftime('%Y-%m-%d %H:%M'),
+            'Yes' if registration.attended else 'No',
+        ] + [flatten_answer(responses.get(label)) for label in labels]
+
+
+class Echo:
+    """csv.writer target that returns each line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    # Keep answers like "=HYPERLINK(...)" from running as formulas in Excel
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def stream_csv(event, chunk_size=EXPORT_CHUNK_SIZE, rows_per_flush=200):
+    writer = csv.writer(Echo())
+    columns = export_columns(event)
+    # BOM so Excel opens the file as UTF-8
+    yield '\ufeff' + writer.writerow(columns)
+    lines = []
+    for row in registration_rows(event, columns[len(BASE_COLUMNS):], chunk_size):
+        lines.append(writer.writerow([csv_cell(value) for value in row]))
+        if len(lines) == rows_per_flush:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+class ZipStream:
+    """Write-only, unseekable file object; zipfile falls back to data descriptors for it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Registrations" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+# Control characters are not allowed in XML 1.0
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c t="n"><v>{value}</v></c>')
+        else:
+            text = escape(ILLEGAL_XML_CHARS.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+
+def stream_xlsx(event, chunk_size=EXPORT_CHUNK_SIZE, rows_per_flush=200):
+    buffer = ZipStream()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, xml in XLSX_PARTS.items():
+            workbook.writestr(name, xml)
+        with workbook.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            columns = export_columns(event)
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + xlsx_row(columns).encode()
+            )
+            yield buffer.drain()
+            for i, row in enumerate(registration_rows(event, columns[len(BASE_COLUMNS):], chunk_size), 1):
+                sheet.write(xlsx_row(row).encode())
+                if i % rows_per_flush == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
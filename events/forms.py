@@ -1,5 +1,8 @@
+from functools import lru_cache
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from .uploads import upload_limits, describe_limits
 from .models import  EventFeedback, Message, EventSuggestion, Certificate, Event, Registration, CustomField
 from django.contrib.auth import get_user_model
 from django.db.models import Q
@@ -53,12 +56,15 @@ class MessageForm(forms.ModelForm):
         fields = ('receiver', 'content')
         widgets = {
             'content': forms.Textarea(attrs={'rows': 4}),
+            # Picked through the user_search typeahead; a <select> would list every account
+            'receiver': forms.HiddenInput(),
         }
     
     def __init__(self, *args, **kwargs):
         sender = kwargs.pop('sender', None)
         super().__init__(*args, **kwargs)
         if sender:
+            # Only used to validate the submitted id (a single get), never rendered
             self.fields['receiver'].queryset = User.objects.exclude(id=sender.id)
 
 class EventSuggestionForm(forms.ModelForm):
@@ -104,30 +110,52 @@ class EventForm(forms.ModelForm):
 
 
 class RegistrationForm(forms.ModelForm):
-    def __init__(self, *args, **kwargs):
-        event = kwargs.pop('event')
-        super().__init__(*args, **kwargs)
+    """Base for the per-event forms built by registration_form_class()."""
+    name = forms.CharField(required=True)
+    email = forms.EmailField(required=True)
+
+    # The event's CustomFields, in order; set on each generated subclass
+    schema = ()
 
-        # Default fields
-        self.fields['name'] = forms.CharField(required=True)
-        self.fields['email'] = forms.EmailField(required=True)
-
-        # Add dynamic fields
-        for field in event.custom_fields.all():
-            if field.field_type == 'text':
-                self.fields[field.label] = forms.CharField(required=field.required)
-            elif field.field_type == 'number':
-                self.fields[field.label] = forms.IntegerField(required=field.required)
-            elif field.field_type == 'file':
-                self.fields[field.label] = forms.FileField(required=field.required)
-            elif field.field_type == 'email':
-                self.fields[field.label] = forms.EmailField(required=field.required)
-            elif field.field_type == 'url':
-                self.fields[field.label] = forms.UrlField(required=field.required)    
     class Meta:
         model = Registration
         fields = ['name', 'email']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Your full name'}),
             'email': forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'Your email address'}),
-        }
\ No newline at end of file
+        }
+
+
+def custom_form_field(field):
+    if field.field_type == 'number':
+        return forms.IntegerField(required=field.required)
+    if field.field_type == 'file':
+        types = upload_limits(field)[1]
+        return forms.FileField(
+            required=field.required,
+            help_text=describe_limits(field),
+            widget=forms.ClearableFileInput(attrs={'accept': ','.join(types)}),
+        )
+    if field.field_type == 'email':
+        return forms.EmailField(required=field.required)
+    if field.field_type == 'url':
+        return forms.URLField(required=field.required)
+    return forms.CharField(required=field.required)
+
+
+@lru_cache(maxsize=512)
+def _build_registration_form(event_id, created_at, schema_version):
+    schema = tuple(CustomField.objects.filter(event_id=event_id).order_by('id'))
+    attrs = {field.label: custom_form_field(field) for field in schema}
+    attrs['schema'] = schema
+    return type(f'RegistrationForm{event_id}', (RegistrationForm,), attrs)
+
+
+def registration_form_class(event):
+    """
+    The registration form for `event`, built once per process for each
+    version of its custom fields. Event.schema_version is bumped whenever they
+    change, so a stale class is simply never looked up again. created_at is
+    part of the key because a deleted event's id can be handed out again.
+    """
+    return _build_registration_form(event.pk, event.created_at, event.schema_version)
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+from events.cache import forget_unread_counts
+from events.models import Conversation, Message
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the Conversation inbox table from existing messages. Messages are read in chunks, '
+        'and each chunk\'s conversations are recounted in a short transaction of their own.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        def unread(receiver, sender):
+            return Coalesce(Subquery(
+                Message.objects.filter(receiver=OuterRef(receiver), sender=OuterRef(sender), is_read=False)
+                .order_by().values('receiver').annotate(n=Count('id')).values('n')
+            ), 0)
+        between = (
+            Q(sender=OuterRef('user_low'), receiver=OuterRef('user_high'))
+            | Q(sender=OuterRef('user_high'), receiver=OuterRef('user_low'))
+        )
+        last = Message.objects.filter(between).order_by('-timestamp', '-id')
+        rebuilt = {
+            'unread_low': unread('user_low', 'user_high'),
+            'unread_high': unread('user_high', 'user_low'),
+            'last_message': Subquery(last.values('id')[:1]),
+            'last_message_snippet': Coalesce(
+                Subquery(last.values(snippet=Substr('content', 1, Conversation.SNIPPET_LENGTH))[:1]), Value('')
+            ),
+            'last_message_at': Subquery(last.values('timestamp')[:1]),
+        }
+
+        # Each pair is recounted from Message in full, so a message sent while the
+        # command runs is counted once whichever side of a batch it lands on: the
+        # batch locks its rows first, and send/read update them in the same
+        # transaction as the Message itself (Message.save, mark_window_read).
+        done = set()
+        last_id = 0
+        processed = 0
+        while True:
+            chunk = list(
+                Message.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'sender_id', 'receiver_id')[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            processed += len(chunk)
+
+            pairs = {tuple(sorted((sender_id, receiver_id))) for _, sender_id, receiver_id in chunk} - done
+            if not pairs:
+                continue
+            done |= pairs
+            Conversation.objects.bulk_create(
+                [Conversation(user_low_id=low, user_high_id=high) for low, high in pairs], ignore_conflicts=True,
+            )
+            with transaction.atomic():
+                ids = [
+                    pk for pk, low, high in Conversation.objects.select_for_update().filter(
+                        user_low_id__in={low for low, _ in pairs}, user_high_id__in={high for _, high in pairs},
+                    ).values_list('id', 'user_low_id', 'user_high_id')
+                    if (low, high) in pairs
+                ]
+                Conversation.objects.filter(id__in=ids).update(**rebuilt)
+                users = {user_id for pair in pairs for user_id in pair}
+                transaction.on_commit(lambda users=users: forget_unread_counts(users))
+
+        # Pairs whose messages are all gone
+        stale = list(
+            Conversation.objects.exclude(Exists(Message.objects.filter(between)))
+            .values_list('id', 'user_low_id', 'user_high_id')
+        )
+        deleted, _ = Conversation.objects.filter(id__in=[row[0] for row in stale]).delete()
+        forget_unread_counts({user_id for row in stale for user_id in row[1:]})
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} messages into {len(done)} conversations, removed {deleted} without messages.'
+        ))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from events.answers import build_answers
+from events.models import CustomField, Registration, RegistrationAnswer
+
+class Command(BaseCommand):
+    help = (
+        'Indexes the custom-field answers of existing registrations into RegistrationAnswer, '
+        'in chunks. Safe to re-run: answers already indexed are left alone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--event', type=int, help='Only backfill this event id')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        registrations = Registration.objects.exclude(responses={})
+        if options['event']:
+            registrations = registrations.filter(event_id=options['event'])
+
+        # label -> field id for each event seen so far
+        field_ids = {}
+        last_id = 0
+        processed = 0
+        created = 0
+        while True:
+            chunk = list(
+                registrations.filter(id__gt=last_id).order_by('id').only('id', 'event_id', 'responses')[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            processed += len(chunk)
+
+            missing = {r.event_id for r in chunk} - field_ids.keys()
+            for event_id in missing:
+                field_ids[event_id] = {}
+            for event_id, label, field_id in CustomField.objects.filter(event_id__in=missing).values_list(
+                'event_id', 'label', 'id'
+            ):
+                field_ids[event_id][label] = field_id
+
+            answers = [a for r in chunk for a in build_answers(r, field_ids[r.event_id])]
+            with transaction.atomic():
+                before = RegistrationAnswer.objects.filter(registration_id__in=[r.id for r in chunk]).count()
+                RegistrationAnswer.objects.bulk_create(answers, ignore_conflicts=True)
+                created += RegistrationAnswer.objects.filter(registration_id__in=[r.id for r in chunk]).count() - before
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} registrations, indexed {created} new answers.'
+        ))
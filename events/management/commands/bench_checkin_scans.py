@@ -0,0 +1,78 @@
+import random
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from events.checkin import CHECKED_IN, make_checkin_token, read_checkin_token, scan
+from events.models import Category, Event, Registration, User
+
+class Command(BaseCommand):
+    help = (
+        'Replays door scans from several concurrent scanners against a throwaway event: every '
+        'attendee scanned twice plus forged codes. Fails on a double check-in and reports '
+        'scans per second. Cleans up after itself.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attendees', type=int, default=2000)
+        parser.add_argument('--scanners', type=int, default=4)
+        parser.add_argument('--forged', type=int, default=200)
+
+    def handle(self, *args, **options):
+        n = options['attendees']
+        tag = uuid.uuid4().hex[:8]
+        now = timezone.now()
+
+        category = Category.objects.create(name=f'bench-{tag}')
+        organizer = User.objects.create(username=f'bench-{tag}-organizer', user_type='organizer')
+        users = User.objects.bulk_create(
+            User(username=f'bench-{tag}-{i}', user_type='participant') for i in range(n)
+        )
+        event = Event.objects.create(
+            title=f'Check-in benchmark {tag}', description='', organizer=organizer, category=category,
+            date=now, start_time=now, location='-', max_participants=n,
+            registration_link='https://example.com',
+        )
+        Registration.objects.bulk_create(
+            Registration(event=event, user=user, name=user.username, email='bench@example.com') for user in users
+        )
+        tokens = [make_checkin_token(r) for r in Registration.objects.filter(event=event).only('id', 'event_id')]
+        forged = [t[:-4] + 'AAAA' for t in random.sample(tokens, min(options['forged'], n))]
+        scans = tokens + tokens + forged
+        random.shuffle(scans)
+
+        def door(token):
+            try:
+                return scan(token, event.id, organizer.id)[0]
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            for token in scans:
+                read_checkin_token(token)
+            verify_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['scanners']) as pool:
+                outcomes = Counter(pool.map(door, scans))
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"Signature check alone: {len(scans) / verify_elapsed:,.0f} tokens/s.\n"
+                f"{len(scans)} scans from {options['scanners']} scanners in {elapsed:.2f}s "
+                f"({len(scans) / elapsed:,.0f} scans/s, {elapsed / len(scans) * 1000:.2f} ms each): {dict(outcomes)}"
+            )
+            attended = Registration.objects.filter(event=event, attended=True).count()
+            if outcomes[CHECKED_IN] != n or attended != n:
+                raise CommandError(f'{outcomes[CHECKED_IN]} check-ins and {attended} attended for {n} attendees')
+            self.stdout.write(self.style.SUCCESS(f'Every attendee checked in exactly once ({n}).'))
+        finally:
+            event.delete()
+            User.objects.filter(username__startswith=f'bench-{tag}').delete()
+            category.delete()
@@ -0,0 +1,94 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+from events.answers import build_answers
+from events.models import Category, CustomField, Event, Registration, RegistrationAnswer, User
+from events.reports import ATTENDED, DAY
+from events.views import event_report
+
+class Command(BaseCommand):
+    help = (
+        'Times the registrant report page and its JSON on a throwaway event with --registrants '
+        'registrations, for each kind of breakdown. Fails when the best of --repeat runs of any of '
+        'them is over --budget-ms. Cleans up after itself.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrants', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--budget-ms', type=float, default=200.0)
+
+    def handle(self, *args, **options):
+        n = options['registrants']
+        tag = uuid.uuid4().hex[:8]
+        now = timezone.now()
+
+        category = Category.objects.create(name=f'bench-{tag}')
+        organizer = User.objects.create(username=f'bench-{tag}-organizer', user_type='organizer')
+        event = Event.objects.create(
+            title=f'Report benchmark {tag}', description='', organizer=organizer, category=category,
+            date=now, start_time=now, location='-', max_participants=n,
+            registration_link='https://example.com',
+        )
+        year = CustomField.objects.create(event=event, label='Year of Study', field_type='number')
+        department = CustomField.objects.create(event=event, label='Department', field_type='text')
+        try:
+            users = User.objects.bulk_create(
+                (User(username=f'bench-{tag}-{i}', user_type='participant') for i in range(n)), batch_size=2000
+            )
+            registrations = Registration.objects.bulk_create(
+                (
+                    Registration(
+                        event=event, user=user, name=user.username, email='bench@example.com',
+                        attended=random.random() < 0.6,
+                        responses={
+                            'Year of Study': str(random.randint(1, 4)),
+                            'Department': random.choice(['CSE', 'ECE', 'ME', 'CE', 'EEE']),
+                        },
+                    )
+                    for user in users
+                ),
+                batch_size=2000,
+            )
+            # Spread over the last 30 days, so the fill curve has a point per day
+            for registration in registrations:
+                registration.registered_at = now - timedelta(seconds=random.randrange(30 * 24 * 3600))
+            Registration.objects.bulk_update(registrations, ['registered_at'], batch_size=2000)
+            field_ids = {year.label: year.id, department.label: department.id}
+            RegistrationAnswer.objects.bulk_create(
+                (answer for registration in registrations for answer in build_answers(registration, field_ids)),
+                batch_size=2000,
+            )
+
+            factory = RequestFactory()
+            over = []
+            for rows, columns in ((DAY, ATTENDED), (year.id, ATTENDED), (year.id, department.id)):
+                for fmt in ('html', 'json'):
+                    request = factory.get('/', {'rows': rows, 'columns': columns, 'format': fmt})
+                    request.user = organizer
+                    best = float('inf')
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        response = event_report(request, event.id)
+                        best = min(best, time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise CommandError(f'{rows} x {columns} ({fmt}) answered {response.status_code}')
+                    ms = best * 1000
+                    self.stdout.write(f'{rows} x {columns} ({fmt}): {ms:.0f} ms')
+                    if ms > options['budget_ms']:
+                        over.append(f'{rows} x {columns} ({fmt})')
+
+            if over:
+                raise CommandError(f'Over the {options["budget_ms"]:.0f} ms budget at {n} registrants: {", ".join(over)}')
+            self.stdout.write(self.style.SUCCESS(
+                f'Every report is within {options["budget_ms"]:.0f} ms at {n} registrants.'
+            ))
+        finally:
+            event.delete()
+            User.objects.filter(username__startswith=f'bench-{tag}').delete()
+            category.delete()
@@ -0,0 +1,67 @@
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from events.models import Category, Event, Registration, User
+from events.seats import reserve_seat
+
+class Command(BaseCommand):
+    help = (
+        'Fires N parallel registrations at a throwaway event with fewer seats than '
+        'registrants, fails if it is oversold and reports throughput. Cleans up after itself.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=500)
+        parser.add_argument('--seats', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=16)
+
+    def handle(self, *args, **options):
+        n, seats = options['registrations'], options['seats']
+        tag = uuid.uuid4().hex[:8]
+        now = timezone.now()
+
+        category = Category.objects.create(name=f'bench-{tag}')
+        organizer = User.objects.create(username=f'bench-{tag}-organizer', user_type='organizer')
+        users = User.objects.bulk_create(
+            User(username=f'bench-{tag}-{i}', user_type='participant') for i in range(n)
+        )
+        event = Event.objects.create(
+            title=f'Seat benchmark {tag}', description='', organizer=organizer, category=category,
+            date=now + timedelta(days=1), start_time=now + timedelta(days=1), location='-',
+            max_participants=seats, registration_link='https://example.com',
+        )
+
+        def register(user):
+            try:
+                return reserve_seat(Registration(event=event, user=user, name=user.username, email='bench@example.com'))
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                # Every user twice, to exercise the duplicate path as well
+                outcomes = Counter(pool.map(register, users + users))
+            elapsed = time.perf_counter() - started
+
+            event.refresh_from_db()
+            registered = Registration.objects.filter(event=event).count()
+            self.stdout.write(
+                f"{2 * n} attempts by {n} users for {seats} seats in {elapsed:.2f}s "
+                f"({2 * n / elapsed:.0f} attempts/s): {dict(outcomes)}"
+            )
+            if registered > seats or event.registered_count != registered:
+                raise CommandError(
+                    f'Oversold: {registered} registrations, counter {event.registered_count}, {seats} seats'
+                )
+            self.stdout.write(self.style.SUCCESS(f'No oversell: {registered}/{seats} seats taken.'))
+        finally:
+            event.delete()
+            User.objects.filter(username__startswith=f'bench-{tag}').delete()
+            category.delete()
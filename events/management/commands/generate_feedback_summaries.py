@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from events.summaries import MAX_ATTEMPTS, generate_batch
+
+class Command(BaseCommand):
+    help = 'Regenerates the AI feedback summaries of events whose feedback changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once nothing is requested')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds to sleep between polls with --loop')
+
+    def handle(self, *args, **options):
+        totals = [0, 0, 0, 0]
+        while True:
+            counts = generate_batch(options['batch_size'], options['max_attempts'])
+            totals = [total + count for total, count in zip(totals, counts)]
+            if any(counts):
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        generated, unchanged, retried, dead = totals
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {generated} summaries, {unchanged} unchanged, '
+            f'scheduled {retried} for retry, dead-lettered {dead}.'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from events.models import Event
+from events.search import get_backend
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for events'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {type(backend).__name__} index for {Event.objects.count()} events.'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from events.models import Event, Registration
+
+class Command(BaseCommand):
+    help = 'Repairs drift in Event.registered_count by recounting registrations in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        actual_count = Coalesce(Subquery(
+            Registration.objects.filter(event=OuterRef('pk'))
+            .order_by().values('event').annotate(n=Count('id')).values('n')
+        ), 0)
+
+        last_id = 0
+        checked = repaired = 0
+        while True:
+            batch = list(
+                Event.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            checked += len(batch)
+
+            with transaction.atomic():
+                drifted = (
+                    Event.objects.filter(id__in=batch)
+                    .annotate(actual=actual_count)
+                    .exclude(registered_count=F('actual'))
+                )
+                repaired += Event.objects.filter(id__in=drifted.values('id')).update(registered_count=actual_count)
+
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} events, repaired {repaired}.'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from events.cache import forget_unread_counts
+from events.models import Conversation, Message
+
+class Command(BaseCommand):
+    help = (
+        'Repairs drift in the Conversation unread counts by recounting unread messages in batches, '
+        'and resets the cached badge counts of the users whose counts changed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        def unread(receiver, sender):
+            return Coalesce(Subquery(
+                Message.objects.filter(receiver=OuterRef(receiver), sender=OuterRef(sender), is_read=False)
+                .order_by().values('receiver').annotate(n=Count('id')).values('n')
+            ), 0)
+        actual_low, actual_high = unread('user_low', 'user_high'), unread('user_high', 'user_low')
+
+        last_id = 0
+        checked = repaired = 0
+        while True:
+            batch = list(
+                Conversation.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            checked += len(batch)
+
+            with transaction.atomic():
+                drifted = list(
+                    Conversation.objects.select_for_update().filter(id__in=batch)
+                    .annotate(actual_low=actual_low, actual_high=actual_high)
+                    .filter(~Q(unread_low=F('actual_low')) | ~Q(unread_high=F('actual_high')))
+                    .values_list('id', 'user_low_id', 'user_high_id')
+                )
+                if drifted:
+                    repaired += Conversation.objects.filter(id__in=[row[0] for row in drifted]).update(
+                        unread_low=actual_low, unread_high=actual_high,
+                    )
+                    users = {user_id for row in drifted for user_id in row[1:]}
+                    transaction.on_commit(lambda users=users: forget_unread_counts(users))
+
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} conversations, repaired {repaired}.'))
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from events.models import Category, Event
+from events.cache import invalidate_home_cache
+from events.search import get_backend
 
 class Command(BaseCommand):
     help = 'Renames the "Business" category to "Non-Technical"'
@@ -22,6 +24,9 @@ class Command(BaseCommand):
                 events_to_update = Event.objects.filter(category=business_category)
                 if events_to_update.exists():
                     events_to_update.update(category=non_technical_category)
+                    # update() skips post_save, so refresh the search index and home cache by hand
+                    get_backend().index(Event.objects.filter(category=non_technical_category).select_related('category'))
+                    invalidate_home_cache()
                     self.stdout.write(self.style.SUCCESS(f'Re-assigned {events_to_update.count()} events from "Business" to "Non-Technical".'))
 
                 # Delete the "Business" category if it's not the same as "Non-Technical"
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from events.rollups import fold_batch
+
+class Command(BaseCommand):
+    help = 'Folds logged registrations, cancellations and check-ins into the daily EventDailyStats rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once the log is empty')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds to sleep between polls with --loop')
+
+    def handle(self, *args, **options):
+        folded = 0
+        while True:
+            count = fold_batch(options['batch_size'])
+            folded += count
+            if count:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Folded {folded} activity rows into the daily rollups.'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from events.outbox import MAX_ATTEMPTS, deliver_batch
+
+class Command(BaseCommand):
+    help = 'Delivers queued outbox emails in batches, one SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once the queue is empty')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep between polls with --loop')
+
+    def handle(self, *args, **options):
+        totals = [0, 0, 0]
+        while True:
+            counts = deliver_batch(options['batch_size'], options['max_attempts'])
+            totals = [total + count for total, count in zip(totals, counts)]
+            if any(counts):
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        sent, retried, dead = totals
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent}, scheduled {retried} for retry, dead-lettered {dead}.'))
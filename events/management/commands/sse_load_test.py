@@ -0,0 +1,97 @@
+import asyncio
+import resource
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = (
+        'Opens many idle chat streams (messages/stream/) against a running ASGI server, '
+        'e.g. `uvicorn event_networking.asgi:application`, and reports how many it could hold'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/messages/stream/')
+        parser.add_argument('--username', required=True, help='User whose session the streams use')
+        parser.add_argument('--connections', type=int, default=3000)
+        parser.add_argument('--hold', type=float, default=30.0, help='Seconds to keep the streams open')
+        parser.add_argument('--concurrency', type=int, default=200, help='Connections opened at once')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}")
+
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+
+        # Every stream is a socket; lift the soft fd limit as far as we're allowed
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = options['connections'] + 100
+        if soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+        stats = asyncio.run(self.run(options, session.session_key))
+        session.delete()
+
+        self.stdout.write(
+            f"Opened {stats['connected']}/{options['connections']} streams in {stats['connect_seconds']:.2f}s "
+            f"({stats['failed']} failed); {stats['alive']} still open after {options['hold']:.0f}s."
+        )
+
+    async def run(self, options, session_key):
+        url = urlsplit(options['url'])
+        request = (
+            f"GET {url.path or '/'} HTTP/1.1\r\n"
+            f"Host: {url.netloc}\r\n"
+            f"Accept: text/event-stream\r\n"
+            f"Cookie: {settings.SESSION_COOKIE_NAME}={session_key}\r\n\r\n"
+        ).encode()
+        stats = {'connected': 0, 'failed': 0, 'alive': 0}
+        gate = asyncio.Semaphore(options['concurrency'])
+        all_connected = asyncio.Event()
+        deadline = None
+
+        async def stream():
+            writer = None
+            try:
+                async with gate:
+                    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+                    writer.write(request)
+                    await writer.drain()
+                    status = await reader.readline()
+                if b' 200 ' not in status:
+                    raise ConnectionError(status.decode(errors='replace').strip())
+                stats['connected'] += 1
+                await all_connected.wait()
+                # Idle: just drain keepalives until the hold period is over
+                while time.monotonic() < deadline:
+                    chunk = await asyncio.wait_for(reader.read(1024), timeout=deadline - time.monotonic())
+                    if not chunk:
+                        raise ConnectionError('closed by server')
+                stats['alive'] += 1
+            except asyncio.TimeoutError:
+                stats['alive'] += 1
+            except (OSError, ConnectionError):
+                stats['failed'] += 1
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        started = time.monotonic()
+        tasks = [asyncio.create_task(stream()) for _ in range(options['connections'])]
+        while stats['connected'] + stats['failed'] < options['connections']:
+            await asyncio.sleep(0.05)
+        stats['connect_seconds'] = time.monotonic() - started
+        deadline = time.monotonic() + options['hold']
+        all_connected.set()
+        await asyncio.gather(*tasks)
+        return stats
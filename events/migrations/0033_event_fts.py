@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    # FTS5 is SQLite-only; other databases use a different search backend.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS events_event_fts USING fts5("
+        "title, description, category, location, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO events_event_fts (rowid, title, description, category, location) "
+        "SELECT e.id, e.title, e.description, c.name, e.location "
+        "FROM events_event e JOIN events_category c ON c.id = e.category_id"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS events_event_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0032_event_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
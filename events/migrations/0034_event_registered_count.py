@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:02
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_registered_count(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Registration = apps.get_model('events', 'Registration')
+    counts = (
+        Registration.objects.filter(event=models.OuterRef('pk'))
+        .order_by().values('event').annotate(n=models.Count('id')).values('n')
+    )
+    Event.objects.update(registered_count=Coalesce(models.Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0033_event_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='registered_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_registered_count, migrations.RunPython.noop),
+    ]
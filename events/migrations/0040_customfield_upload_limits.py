@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0039_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customfield',
+            name='allowed_file_types',
+            field=models.CharField(blank=True, help_text='Comma-separated MIME types, e.g. application/pdf, image/*', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customfield',
+            name='max_file_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Bytes', null=True),
+        ),
+    ]
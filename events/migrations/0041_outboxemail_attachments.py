@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0040_customfield_upload_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='attachments',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0041_outboxemail_attachments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='schema_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0042_event_schema_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=255)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.event')),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='events.customfield')),
+                ('registration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='events.registration')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['event', 'field', 'value'], name='answer_facet_idx')],
+                'unique_together': {('registration', 'field')},
+            },
+        ),
+    ]
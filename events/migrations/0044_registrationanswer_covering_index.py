@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0043_registrationanswer'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='registrationanswer',
+            name='answer_facet_idx',
+        ),
+        migrations.AddIndex(
+            model_name='registrationanswer',
+            index=models.Index(fields=['event', 'field', 'value', 'registration'], name='answer_facet_idx'),
+        ),
+    ]
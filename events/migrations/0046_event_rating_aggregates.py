@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    EventFeedback = apps.get_model('events', 'EventFeedback')
+    rows = EventFeedback.objects.order_by().values('event').annotate(
+        rating_count=models.Count('id'),
+        rating_sum=models.Sum('rating'),
+        **{f'rating_{stars}': models.Count('id', filter=models.Q(rating=stars)) for stars in range(1, 6)},
+    )
+    events = []
+    for row in rows:
+        event = Event(id=row.pop('event'), **row)
+        event.rating_average = event.rating_sum / event.rating_count
+        events.append(event)
+    Event.objects.bulk_update(events, [
+        'rating_count', 'rating_sum', 'rating_average', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0045_registration_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_average',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['rating_average', 'rating_count', 'id'], name='event_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventfeedback',
+            index=models.Index(fields=['event', 'created_at'], name='feedback_event_created_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0046_event_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackSummary',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feedback_summary', serialize=False, to='events.event')),
+                ('text', models.TextField(blank=True)),
+                ('feedback_hash', models.CharField(blank=True, max_length=64)),
+                ('backend', models.CharField(blank=True, max_length=100)),
+                ('generated_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'feedback summaries',
+                'indexes': [models.Index(fields=['requested_at'], name='summary_requested_idx')],
+            },
+        ),
+    ]
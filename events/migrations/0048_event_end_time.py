@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_end_time(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    duration = models.ExpressionWrapper(models.F('duration') * timedelta(minutes=1), output_field=models.DurationField())
+    Event.objects.update(
+        end_time=models.ExpressionWrapper(models.F('start_time') + duration, output_field=models.DateTimeField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0047_feedbacksummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='end_time',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_end_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='event',
+            name='end_time',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['end_time'], name='event_end_time_idx'),
+        ),
+    ]
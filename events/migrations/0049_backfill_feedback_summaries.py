@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def request_missing_summaries(apps, schema_editor):
+    """Request a summary for every event whose feedback predates FeedbackSummary."""
+    EventFeedback = apps.get_model('events', 'EventFeedback')
+    FeedbackSummary = apps.get_model('events', 'FeedbackSummary')
+    now = timezone.now()
+    event_ids = (
+        EventFeedback.objects.filter(event__feedback_summary__isnull=True)
+        .order_by().values_list('event_id', flat=True).distinct()
+    )
+    FeedbackSummary.objects.bulk_create(
+        [FeedbackSummary(event_id=event_id, requested_at=now) for event_id in event_ids],
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0048_event_end_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(request_missing_summaries, migrations.RunPython.noop),
+    ]
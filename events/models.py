@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Cast, Greatest, Lower
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
 from django.utils import timezone
@@ -16,6 +17,14 @@ class User(AbstractUser):
     bio = models.TextField(max_length=500, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True)
     areas_of_interest = models.ManyToManyField('Category', blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive prefix search for the message receiver picker
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            models.Index(Lower('first_name'), name='user_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='user_last_name_lower_idx'),
+        ]
     
     def __str__(self):
         return f"{self.username} ({self.user_type})"
@@ -30,6 +39,57 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class EventQuerySet(models.QuerySet):
+    """Status filters mirroring Event.status, evaluated in SQL on the indexed start/end columns."""
+
+    def upcoming(self, now=None):
+        now = now or timezone.now()
+        return self.filter(start_time__gt=now)
+
+    def ongoing(self, now=None):
+        now = now or timezone.now()
+        return self.filter(start_time__lte=now, end_time__gte=now)
+
+    def completed(self, now=None):
+        now = now or timezone.now()
+        return self.filter(end_time__lt=now)
+
+    def recently_completed(self, hours=5, now=None):
+        now = now or timezone.now()
+        return self.completed(now).filter(end_time__gt=now - timedelta(hours=hours))
+
+    def bump_schema_version(self):
+        """Invalidate cached registration forms after CustomField changes (see forms.registration_form_class)."""
+        return self.update(schema_version=models.F('schema_version') + 1)
+
+    def top_rated(self, min_rating=None, now=None):
+        """Completed events with feedback, best average first, read off event_rating_idx."""
+        queryset = self.completed(now).filter(rating_average__isnull=False)
+        if min_rating is not None:
+            queryset = queryset.filter(rating_average__gte=min_rating)
+        return queryset.order_by('-rating_average', '-rating_count', '-id')
+
+    def adjust_rating(self, rating, delta):
+        """Add (delta=1) or remove (delta=-1) one `rating` in a single UPDATE."""
+        count = models.F('rating_count') + delta
+        total = models.F('rating_sum') + delta * rating
+        return self.update(
+            rating_count=count,
+            rating_sum=total,
+            # Same statement, so computed from the old values plus the change
+            rating_average=models.Case(
+                models.When(rating_count__gt=-delta, then=Cast(total, models.FloatField()) / Cast(count, models.FloatField())),
+                default=None,
+            ),
+            **{f'rating_{rating}': models.F(f'rating_{rating}') + delta},
+        )
+
+    def active_or_recent(self, hours=5, now=None):
+        """Upcoming and ongoing events plus those that ended in the last `hours` hours."""
+        now = now or timezone.now()
+        return self.filter(end_time__gt=now - timedelta(hours=hours))
+
+
 class Event(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -43,7 +103,46 @@ class Event(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     start_time = models.DateTimeField()
     duration = models.IntegerField(default=60)
+    # start_time + duration, kept in step by save() so the status filters can use an index
+    end_time = models.DateTimeField(editable=False)
     image = models.ImageField(upload_to='event_posters/', blank=True, null=True)
+    # Denormalized Registration count, maintained with F() updates by the
+    # Registration signals (see signals.py) and repaired by reconcile_registration_counts
+    registered_count = models.PositiveIntegerField(default=0, editable=False)
+    # Last waitlist ticket handed out (see seats.join_waitlist)
+    waitlist_seq = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped whenever the event's CustomFields change
+    schema_version = models.PositiveIntegerField(default=0, editable=False)
+    # EventFeedback aggregates, maintained with F() updates by the feedback
+    # signals (see EventQuerySet.adjust_rating). rating_average is NULL until rated.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.FloatField(null=True, blank=True, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    RATING_FIELDS = ('rating_count', 'rating_sum', 'rating_average', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+    # Columns only ever changed through F() updates
+    COUNTER_FIELDS = ('registered_count', 'waitlist_seq', 'schema_version') + RATING_FIELDS
+
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination in EventListView walks events in (date, id) order
+            models.Index(fields=['date', 'id'], name='event_date_id_idx'),
+            # organizer_dashboard / profile_view: an organizer's events, newest first
+            models.Index(fields=['organizer', 'created_at'], name='event_organizer_created_idx'),
+            # upcoming()/ongoing() status filters
+            models.Index(fields=['start_time'], name='event_start_time_idx'),
+            # completed()/active_or_recent() status filters
+            models.Index(fields=['end_time'], name='event_end_time_idx'),
+            # top_rated(): walked backwards, best first
+            models.Index(fields=['rating_average', 'rating_count', 'id'], name='event_rating_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -51,6 +150,27 @@ class Event(models.Model):
     def get_absolute_url(self):
         return reverse('event_detail', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        self.end_time = self.start_time + timedelta(minutes=self.duration)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'start_time', 'duration'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'end_time'}
+        # Never write back stale in-memory counters over concurrent F() updates
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def rating_histogram(self):
+        """[(stars, count, percent of ratings)] from 5 stars down to 1."""
+        return [
+            (stars, getattr(self, f'rating_{stars}'), getattr(self, f'rating_{stars}') * 100 / (self.rating_count or 1))
+            for stars in range(5, 0, -1)
+        ]
+
     @property
     def status(self):
         now = timezone.now()
@@ -65,10 +185,6 @@ class Event(models.Model):
         else:
             return 'completed'
 
-    @property
-    def registered_count(self):
-        return self.registrations_real.count()
-
 FIELD_TYPES = (
     ('text', 'Text'),
     ('number', 'Number'),
@@ -82,10 +198,27 @@ class CustomField(models.Model):
     label = models.CharField(max_length=100)
     field_type = models.CharField(max_length=20, choices=FIELD_TYPES, default='text')
     required = models.BooleanField(default=False)
+    # Limits for 'file' fields; empty means settings.REGISTRATION_UPLOAD_MAX_SIZE / _TYPES
+    max_file_size = models.PositiveIntegerField(null=True, blank=True, help_text='Bytes')
+    allowed_file_types = models.CharField(
+        max_length=255, blank=True, help_text='Comma-separated MIME types, e.g. application/pdf, image/*'
+    )
 
     def __str__(self):
         return f"{self.label} ({self.event.title})"        
 
+    # Cached registration forms are keyed by Event.schema_version (forms.registration_form_class).
+    # This override is the only per-row bump: bulk edits go through schema.apply_field_changes,
+    # which bumps it once itself, and fixture loads don't call save().
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Event.objects.filter(pk=self.event_id).bump_schema_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Event.objects.filter(pk=self.event_id).bump_schema_version()
+        return result
+
 class EventRegistration(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='registrations')
     participant = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -114,6 +247,16 @@ class EventFeedback(models.Model):
     
     class Meta:
         unique_together = ('event', 'participant')
+        indexes = [
+            # EventDetailView: an event's latest feedback
+            models.Index(fields=['event', 'created_at'], name='feedback_event_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The rating signals lock the stored row in pre_save and adjust the event in
+        # post_save (see signals.py); the lock only holds inside a transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.event.title} - {self.rating} stars"
@@ -143,10 +286,106 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # chat_view: history between two users in time order
+            models.Index(fields=['sender', 'receiver', 'timestamp'], name='message_pair_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The post_save signal records the message on its Conversation row; both
+        # commit together, which backfill_conversations relies on
+        with transaction.atomic():
+            super().save(*args, **kwargs)
     
     def __str__(self):
         return f"From {self.sender.username} to {self.receiver.username}"
 
+class ConversationQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """A user's inbox, most recent conversation first."""
+        return self.filter(
+            models.Q(user_low=user) | models.Q(user_high=user)
+        ).select_related('user_low', 'user_high').order_by('-last_message_at')
+
+    def unread_count(self, user_id):
+        """A user's unread messages across all their conversations."""
+        return self.filter(models.Q(user_low_id=user_id) | models.Q(user_high_id=user_id)).aggregate(
+            unread=models.Sum(models.Case(models.When(user_low_id=user_id, then='unread_low'), default='unread_high'))
+        )['unread'] or 0
+
+    def between(self, user_a_id, user_b_id):
+        low, high = sorted((user_a_id, user_b_id))
+        return self.filter(user_low_id=low, user_high_id=high)
+
+class Conversation(models.Model):
+    """
+    One row per pair of users who have exchanged messages (user_low.id < user_high.id),
+    holding what the inbox shows so it doesn't have to touch Message at all.
+    Maintained by record_message() and mark_read(); rebuilt by backfill_conversations.
+    """
+    SNIPPET_LENGTH = 100
+
+    user_low = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_snippet = models.CharField(max_length=SNIPPET_LENGTH, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_low = models.PositiveIntegerField(default=0)
+    unread_high = models.PositiveIntegerField(default=0)
+
+    objects = ConversationQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('user_low', 'user_high')
+        indexes = [
+            models.Index(fields=['user_low', 'last_message_at'], name='conversation_low_time_idx'),
+            models.Index(fields=['user_high', 'last_message_at'], name='conversation_high_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_low.username} <-> {self.user_high.username}"
+
+    @staticmethod
+    def unread_field(user_id, other_id):
+        return 'unread_low' if user_id < other_id else 'unread_high'
+
+    def other_user(self, user):
+        return self.user_high if self.user_low_id == user.id else self.user_low
+
+    def unread_for(self, user):
+        return self.unread_low if self.user_low_id == user.id else self.unread_high
+
+    @classmethod
+    def record_message(cls, message):
+        """Make `message` the pair's last message and bump the receiver's unread count."""
+        low, high = sorted((message.sender_id, message.receiver_id))
+        unread_field = cls.unread_field(message.receiver_id, message.sender_id)
+        last = {
+            'last_message': message,
+            'last_message_snippet': message.content[:cls.SNIPPET_LENGTH],
+            'last_message_at': message.timestamp,
+        }
+        conversation, created = cls.objects.get_or_create(
+            user_low_id=low, user_high_id=high,
+            defaults={**last, unread_field: 0 if message.is_read else 1},
+        )
+        if created:
+            return
+        pair = cls.objects.filter(pk=conversation.pk)
+        if not message.is_read:
+            pair.update(**{unread_field: models.F(unread_field) + 1})
+        pair.filter(
+            models.Q(last_message_at__isnull=True) | models.Q(last_message_at__lte=message.timestamp)
+        ).update(**last)
+
+    @classmethod
+    def mark_read(cls, reader_id, other_id, count):
+        """`reader` has read `count` of the messages `other` sent them."""
+        unread_field = cls.unread_field(reader_id, other_id)
+        cls.objects.between(reader_id, other_id).update(
+            **{unread_field: Greatest(models.F(unread_field) - count, 0)}
+        )
+
 class EventSuggestion(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='suggestions')
     participant = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -175,4 +414,164 @@ class Registration(models.Model):
         return f"{self.name} - {self.event.title}"
 
     class Meta:
-        unique_together = ('event', 'user')
\ No newline at end of file
+        unique_together = ('event', 'user')
+        indexes = [
+            # profile_view: a participant's registrations, newest first
+            models.Index(fields=['user', 'registered_at'], name='registration_user_time_idx'),
+        ]
+
+class RegistrationAnswer(models.Model):
+    """
+    One custom-field answer, normalized out of Registration.responses so that
+    filters and facet counts are index lookups and GROUP BYs rather than JSON
+    parsing (see answers.py). Written in the same transaction as the registration.
+    """
+    VALUE_LENGTH = 255
+
+    registration = models.ForeignKey(Registration, on_delete=models.CASCADE, related_name='answers')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='+')
+    field = models.ForeignKey(CustomField, on_delete=models.CASCADE, related_name='answers')
+    value = models.CharField(max_length=VALUE_LENGTH)
+
+    class Meta:
+        unique_together = ('registration', 'field')
+        indexes = [
+            # Filters (event, field, value) and facet counts GROUP BY field, value.
+            # Carrying the registration makes reports.py's per-field read index-only.
+            models.Index(fields=['event', 'field', 'value', 'registration'], name='answer_facet_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.field_id}={self.value}"
+
+class WaitlistEntry(models.Model):
+    """
+    A participant waiting for a seat on a full event. Tickets are contiguous per
+    event (leaving the list shifts everyone behind up by one), so a position is
+    ticket - head ticket + 1: two index seeks rather than a COUNT over the queue.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    ticket = models.PositiveIntegerField()
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    responses = models.JSONField(default=dict)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('event', 'user')
+        indexes = [
+            models.Index(fields=['event', 'ticket'], name='waitlist_event_ticket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.event.title} (#{self.ticket})"
+
+
+class OutboxEmail(models.Model):
+    """
+    Outgoing email written in the same transaction as whatever triggered it and
+    delivered later by `manage.py send_outbox_emails` (see outbox.py).
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    # [{"filename": ..., "content": <base64>, "mimetype": ...}]
+    attachments = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "what is due" lookup
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+class RegistrationActivity(models.Model):
+    """
+    Append-only log of registrations, cancellations and check-ins, folded into
+    EventDailyStats by `manage.py rollup_registration_stats` (see rollups.py)
+    and then deleted. Cancellations delete their Registration, so this log is
+    the only record of them until the rollup has run.
+    """
+    REGISTERED = 'registered'
+    CANCELLED = 'cancelled'
+    ATTENDED = 'attended'
+    KINDS = (
+        (REGISTERED, 'Registered'),
+        (CANCELLED, 'Cancelled'),
+        (ATTENDED, 'Attended'),
+    )
+
+    # No database constraint: deleting an event logs its registrations'
+    # cancellations on the way out, and the rollup drops those rows
+    event = models.ForeignKey(
+        Event, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+    count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.event_id} {self.kind} x{self.count}"
+
+class EventDailyStats(models.Model):
+    """Registrations, cancellations and check-ins per event per local day, for dashboard trends."""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    registrations = models.PositiveIntegerField(default=0)
+    cancellations = models.PositiveIntegerField(default=0)
+    attendances = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('event', 'day')
+        verbose_name_plural = 'event daily stats'
+
+    def __str__(self):
+        return f"{self.event_id} {self.day}"
+
+class FeedbackSummary(models.Model):
+    """
+    The last good AI summary of an event's feedback. EventDetailView only ever
+    reads this row; `manage.py generate_feedback_summaries` rewrites it in the
+    background (see summaries.py). requested_at is set when the feedback changes
+    and cleared once a summary of the current feedback is stored, or once
+    generating one has failed too many times.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='feedback_summary')
+    text = models.TextField(blank=True)
+    # sha256 of the feedback set `text` was generated from
+    feedback_hash = models.CharField(max_length=64, blank=True)
+    backend = models.CharField(max_length=100, blank=True)
+    generated_at = models.DateTimeField(null=True, blank=True)
+    requested_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name_plural = 'feedback summaries'
+        indexes = [
+            # The worker's "what is due" lookup
+            models.Index(fields=['requested_at'], name='summary_requested_idx'),
+        ]
+
+    def __str__(self):
+        return f"Summary of {self.event_id}"
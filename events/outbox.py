@@ -0,0 +1,121 @@
+"""
+Transactional email outbox.
+
+Views call enqueue_email() inside the transaction that creates the data the
+mail is about, so a mail is queued exactly when that data commits and the
+request never waits on SMTP. `manage.py send_outbox_emails` drains the queue
+with deliver_batch(): one SMTP connection per batch, exponential backoff on
+failure, and dead-lettering after max_attempts.
+"""
+import base64
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 60 * 60
+# How long a worker owns the rows it claimed before another worker may retry them
+CLAIM_LEASE_SECONDS = 10 * 60
+
+
+def enqueue_email(subject, body, to, from_email=None, attachments=()):
+    """`attachments` are (filename, content bytes, mimetype) tuples."""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        attachments=[
+            {'filename': filename, 'content': base64.b64encode(content).decode(), 'mimetype': mimetype}
+            for filename, content, mimetype in attachments
+        ],
+    )
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to `batch_size` due emails for this worker: select the due ids, then
+    stamp them with this worker's token in an UPDATE that repeats the due
+    condition. A row another worker claimed in between no longer matches, so two
+    workers never send the same row.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due_ids = list(
+        OutboxEmail.objects.filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size]
+    )
+    OutboxEmail.objects.filter(
+        id__in=due_ids, status=OutboxEmail.PENDING, next_attempt_at__lte=now
+    ).update(claim_token=token, next_attempt_at=now + timedelta(seconds=CLAIM_LEASE_SECONDS))
+    return list(OutboxEmail.objects.filter(claim_token=token).order_by('id'))
+
+
+def deliver_batch(batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """Send one batch over a single connection. Returns (sent, retried, dead)."""
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0, 0
+
+    sent = retried = dead = 0
+    now = timezone.now()
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        connection = None
+        open_error = e
+
+    for email in emails:
+        email.claim_token = ''
+        try:
+            if connection is None:
+                raise open_error
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email or None,
+                to=email.to,
+                connection=connection,
+            )
+            for attachment in email.attachments:
+                message.attach(
+                    attachment['filename'], base64.b64decode(attachment['content']), attachment['mimetype']
+                )
+            message.send()
+        except Exception as e:
+            email.attempts += 1
+            email.last_error = f"{type(e).__name__}: {e}"
+            if email.attempts >= max_attempts:
+                email.status = OutboxEmail.DEAD
+                dead += 1
+                logger.error("Outbox email %s dead-lettered: %s", email.pk, email.last_error)
+            else:
+                email.next_attempt_at = now + backoff(email.attempts)
+                retried += 1
+        else:
+            email.attempts += 1
+            email.status = OutboxEmail.SENT
+            email.sent_at = timezone.now()
+            sent += 1
+
+    if connection is not None:
+        connection.close()
+
+    OutboxEmail.objects.bulk_update(
+        emails, ['claim_token', 'attempts', 'status', 'sent_at', 'next_attempt_at', 'last_error']
+    )
+    return sent, retried, dead
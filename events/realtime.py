@@ -0,0 +1,102 @@
+"""
+Push channel for chat: new messages and read receipts, streamed to browsers as
+Server-Sent Events from the ASGI app (see views.message_stream).
+
+Publishers are ordinary sync code (signals, views); subscribers are the async
+SSE responses. The broker in use comes from the MESSAGE_BROKER setting (a dotted
+path). InProcessBroker only reaches connections held by the same process, so a
+multi-worker deployment should plug in a shared broker (e.g. Redis pub/sub)
+implementing the same publish()/subscribe() pair.
+"""
+import asyncio
+import contextlib
+import logging
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Broker:
+    def publish(self, user_id, event):
+        """Deliver `event` (a JSON-serializable dict) to every stream of `user_id`."""
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """Async context manager yielding an object with an async get() for the next event."""
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    # Events a slow client may have queued before newer ones are dropped
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            # Publishers run in sync threads, the queues belong to the event loop
+            loop.call_soon_threadsafe(self._deliver, queue, event)
+
+    @staticmethod
+    def _deliver(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping chat event for a slow stream")
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, user_id):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(user_id)
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, 'MESSAGE_BROKER', 'events.realtime.InProcessBroker'))()
+    return _broker
+
+
+def message_event(message):
+    return {
+        'type': 'message',
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'receiver_id': message.receiver_id,
+        'content': message.content,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
+def publish_message(message):
+    broker = get_broker()
+    event = message_event(message)
+    broker.publish(message.receiver_id, event)
+    broker.publish(message.sender_id, event)
+
+
+def publish_read_receipt(reader_id, sender_id, message_ids):
+    get_broker().publish(sender_id, {'type': 'read', 'reader_id': reader_id, 'message_ids': message_ids})
@@ -0,0 +1,209 @@
+"""
+Cross-tab reports on one event's registrants.
+
+RegistrantReport reads the event's registrations once, as three NumPy
+columns: id, registration time and attended. Each custom field used in a
+report is read from RegistrationAnswer's covering index grouped by value,
+and each value's registrations become one integer code. Histograms,
+cross-tabs and the fill curve are then bincounts and cumsums over those
+codes. No Python loop over registrants and no JSON parsing.
+
+On SQLite and PostgreSQL each column arrives as one comma-separated string
+per query (or per answer value) and is parsed by NumPy, rather than as one
+Python tuple per row. At 50k registrants building those tuples costs more
+than the queries themselves. Other databases read rows.
+
+A dimension is DAY (local registration date), ATTENDED, or a CustomField id.
+"""
+from datetime import datetime
+
+# Install: pip install numpy
+import numpy as np
+from django.db import connections
+from django.db.models import Aggregate, Func, IntegerField, TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Registration, RegistrationAnswer
+
+DAY = 'day'
+ATTENDED = 'attended'
+NO_ANSWER = '(no answer)'
+
+REGISTRANT_ROW = np.dtype([('id', np.int64), ('registered_at', np.int64), ('attended', np.int64)])
+ANSWER_ROW = np.dtype([('value', object), ('registration_id', np.int64)])
+
+
+class Epoch(Func):
+    """Whole seconds since 1970 for a datetime column, computed by the database."""
+    output_field = IntegerField()
+    template = 'CAST(ROUND(EXTRACT(EPOCH FROM %(expressions)s)) AS BIGINT)'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(ROUND((julianday(%(expressions)s) - 2440587.5) * 86400.0) AS INTEGER)', **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='CAST(ROUND(UNIX_TIMESTAMP(%(expressions)s)) AS SIGNED)', **extra_context)
+
+
+class Packed(Aggregate):
+    """A numeric column as one comma-separated string. Rows come in no particular order."""
+    function = 'GROUP_CONCAT'
+    output_field = TextField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template="STRING_AGG((%(expressions)s)::text, ',')", **extra_context
+        )
+
+
+# Databases where Packed() needs no configuration (MySQL truncates GROUP_CONCAT at 1 kB by default)
+PACKED_VENDORS = ('sqlite', 'postgresql')
+
+
+def unpack(packed, dtype):
+    return np.fromstring(packed or '', sep=',', dtype=dtype)
+
+
+def local_days(epochs):
+    """Days since 1970 in the current time zone. The UTC offset is looked up once per distinct hour."""
+    tz = timezone.get_current_timezone()
+    hours, inverse = np.unique(epochs // 3600, return_inverse=True)
+    offsets = np.array(
+        [datetime.fromtimestamp(hour * 3600, tz).utcoffset().total_seconds() for hour in hours.tolist()],
+        dtype=np.int64,
+    )
+    return (epochs + offsets[inverse]) // 86400
+
+
+def fetch_rows(queryset):
+    """
+    A values_list() queryset's rows straight from cursor.fetchall(). At report
+    sizes Django's row iterator costs as much again as the query itself.
+    Only for querysets whose columns need no conversion from the database.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def report_dimensions(schema):
+    """(key, label) choices for an event's reports. File answers are not grouped on."""
+    return [(DAY, 'Registration day'), (ATTENDED, 'Attendance')] + [
+        (field.id, field.label) for field in schema if field.field_type != 'file'
+    ]
+
+
+class RegistrantReport:
+    def __init__(self, event):
+        self.event = event
+        registrations = Registration.objects.filter(event=event)
+        columns = {'id': 'id', 'registered_at': Epoch('registered_at'), 'attended': Cast('attended', IntegerField())}
+        if connections[registrations.db].vendor in PACKED_VENDORS:
+            packed = registrations.aggregate(**{name: Packed(column) for name, column in columns.items()})
+            columns = {name: unpack(packed[name], REGISTRANT_ROW[name]) for name in columns}
+            order = np.argsort(columns['id'])
+            columns = {name: column[order] for name, column in columns.items()}
+        else:
+            rows = fetch_rows(registrations.order_by('id').values_list(*columns.values()))
+            columns = np.fromiter(rows, dtype=REGISTRANT_ROW, count=len(rows))
+        self.ids = columns['id']
+        self.registered_at = columns['registered_at']
+        self.attended = columns['attended'].astype(bool)
+        self._dimensions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def dimension(self, key):
+        """(codes, labels): one code per registrant, indexing into labels."""
+        if key not in self._dimensions:
+            if key == DAY:
+                self._dimensions[key] = self._days()
+            elif key == ATTENDED:
+                self._dimensions[key] = (self.attended.astype(np.int64), ['Not attended', 'Attended'])
+            else:
+                self._dimensions[key] = self._answers(key)
+        return self._dimensions[key]
+
+    def _days(self):
+        if not len(self):
+            return np.zeros(0, dtype=np.int64), []
+        days = local_days(self.registered_at)
+        first = days.min()
+        labels = np.arange(first, days.max() + 1).astype('datetime64[D]').astype(str).tolist()
+        return days - first, labels
+
+    def _answers(self, field_id):
+        answers = RegistrationAnswer.objects.filter(event=self.event, field_id=field_id).order_by('value')
+        if connections[answers.db].vendor in PACKED_VENDORS:
+            # One row per value, carrying its registrations
+            groups = list(answers.values('value').annotate(ids=Packed('registration_id')).values_list('value', 'ids'))
+            labels = [value for value, packed in groups]
+            ids = [unpack(packed, np.int64) for value, packed in groups]
+            codes = np.repeat(np.arange(len(ids)), [len(group) for group in ids])
+            registration_ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+        else:
+            rows = fetch_rows(answers.values_list('value', 'registration_id'))
+            columns = np.fromiter(rows, dtype=ANSWER_ROW, count=len(rows))
+            values, registration_ids = columns['value'], columns['registration_id']
+            # Rows arrive sorted by value, so a new code starts wherever the value changes
+            starts = np.ones(len(values), dtype=bool)
+            starts[1:] = values[1:] != values[:-1]
+            codes = np.cumsum(starts) - 1
+            labels = values[starts].tolist()
+
+        # Registrants without an answer get an extra trailing code
+        answer_codes = np.full(len(self), len(labels), dtype=np.int64)
+        positions = np.searchsorted(self.ids, registration_ids).clip(max=max(len(self) - 1, 0))
+        # Skip answers of registrations saved after the registrations were read
+        known = self.ids[positions] == registration_ids if len(self) else np.zeros(0, dtype=bool)
+        answer_codes[positions[known]] = codes[known]
+        if (answer_codes == len(labels)).any():
+            labels.append(NO_ANSWER)
+        return answer_codes, labels
+
+    def histogram(self, key):
+        codes, labels = self.dimension(key)
+        return {'labels': labels, 'counts': np.bincount(codes, minlength=len(labels)).tolist()}
+
+    def cross_tab(self, rows, columns):
+        row_codes, row_labels = self.dimension(rows)
+        column_codes, column_labels = self.dimension(columns)
+        shape = (len(row_labels), len(column_labels))
+        counts = np.bincount(row_codes * shape[1] + column_codes, minlength=shape[0] * shape[1]).reshape(shape)
+        return {
+            'rows': row_labels,
+            'columns': column_labels,
+            'counts': counts.tolist(),
+            'row_totals': counts.sum(axis=1).tolist(),
+            'column_totals': counts.sum(axis=0).tolist(),
+        }
+
+    def attendance_rates(self, key):
+        """Registered and attended counts per value of `key`, and the share who attended."""
+        codes, labels = self.dimension(key)
+        registered = np.bincount(codes, minlength=len(labels))
+        attended = np.bincount(codes, weights=self.attended, minlength=len(labels)).astype(np.int64)
+        rates = np.divide(attended, registered, out=np.zeros(len(labels)), where=registered > 0)
+        return {
+            'labels': labels,
+            'registered': registered.tolist(),
+            'attended': attended.tolist(),
+            'rates': np.round(rates, 4).tolist(),
+        }
+
+    def fill_curve(self):
+        """Cumulative registrations per day, and as a share of max_participants."""
+        codes, labels = self.dimension(DAY)
+        cumulative = np.cumsum(np.bincount(codes, minlength=len(labels)))
+        capacity = self.event.max_participants
+        return {
+            'days': labels,
+            'registered': cumulative.tolist(),
+            'fill': np.round(cumulative / capacity, 4).tolist() if capacity else None,
+        }
@@ -0,0 +1,84 @@
+"""
+Daily registration rollups for the organizer dashboard.
+
+Registering, cancelling and checking in each append a RegistrationActivity
+row in the same transaction (signals.py, attendance.py, checkin.py). The
+rollup_registration_stats command folds those rows, a batch at a time, into
+one EventDailyStats row per event per local day and deletes them. The
+dashboard's trend is then one GROUP BY over a few rows per event per day,
+and never scans Registration.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Event, EventDailyStats, RegistrationActivity
+
+STAT_FIELDS = {
+    RegistrationActivity.REGISTERED: 'registrations',
+    RegistrationActivity.CANCELLED: 'cancellations',
+    RegistrationActivity.ATTENDED: 'attendances',
+}
+
+
+def record_activity(event_id, kind, count=1):
+    if count:
+        RegistrationActivity.objects.create(event_id=event_id, kind=kind, count=count)
+
+
+def fold_batch(batch_size=1000):
+    """Fold the oldest `batch_size` activity rows into EventDailyStats. Returns how many were folded."""
+    with transaction.atomic():
+        # Locked until commit, so a second worker waits rather than folding the same rows
+        activity = list(RegistrationActivity.objects.select_for_update().order_by('id')[:batch_size])
+        if not activity:
+            return 0
+
+        totals = defaultdict(lambda: defaultdict(int))
+        for row in activity:
+            totals[row.event_id, timezone.localdate(row.created_at)][STAT_FIELDS[row.kind]] += row.count
+        # Events deleted since: their activity is dropped with the batch
+        live = set(Event.objects.filter(id__in={event_id for event_id, day in totals}).values_list('id', flat=True))
+
+        existing = {
+            (stats.event_id, stats.day): stats
+            for stats in EventDailyStats.objects.select_for_update().filter(
+                event_id__in=live, day__in={day for event_id, day in totals}
+            )
+        }
+        to_create, to_update = [], []
+        for (event_id, day), counts in totals.items():
+            if event_id not in live:
+                continue
+            stats = existing.get((event_id, day))
+            if stats is None:
+                stats = EventDailyStats(event_id=event_id, day=day)
+                to_create.append(stats)
+            else:
+                to_update.append(stats)
+            for field, count in counts.items():
+                setattr(stats, field, getattr(stats, field) + count)
+
+        EventDailyStats.objects.bulk_create(to_create)
+        EventDailyStats.objects.bulk_update(to_update, list(STAT_FIELDS.values()))
+        RegistrationActivity.objects.filter(id__in=[row.id for row in activity]).delete()
+    return len(activity)
+
+
+def organizer_trend(organizer, days=30):
+    """Daily totals across `organizer`'s events for the last `days` days, oldest first, gaps filled with zeros."""
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = {
+        row['day']: row
+        for row in EventDailyStats.objects.filter(event__organizer=organizer, day__gte=start)
+        .values('day').annotate(**{field: Sum(field) for field in STAT_FIELDS.values()}).order_by('day')
+    }
+    empty = dict.fromkeys(STAT_FIELDS.values(), 0)
+    return [
+        {'day': day, **{field: rows.get(day, empty)[field] for field in STAT_FIELDS.values()}}
+        for day in (start + timedelta(days=i) for i in range(days))
+    ]
@@ -0,0 +1,123 @@
+"""
+Editing an event's custom registration fields.
+
+The event form posts the complete list of fields it wants. fields_from_post()
+reads that list, and apply_field_changes() diffs it against what is stored.
+Rows are matched by id, or by label for the built-in checkboxes and re-added
+fields. The differences are written in one transaction: a bulk_create, a
+bulk_update and a single DELETE, followed by one schema version bump.
+
+Field ids survive edits. A renamed field takes its existing answers along:
+Registration.responses is keyed by label, so affected rows are rewritten
+under the new name.
+"""
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import FIELD_TYPES, CustomField, Event, Registration, WaitlistEntry
+
+BUILTIN_FIELDS = {
+    "Phone Number": "text",
+    "College Name": "text",
+    "Department": "text",
+    "Year of Study": "number",
+    "ID Card": "file",
+}
+
+FieldSpec = namedtuple('FieldSpec', ['id', 'label', 'field_type', 'required'])
+
+ANSWER_REWRITE_CHUNK_SIZE = 500
+
+
+def fields_from_post(post):
+    """
+    The fields requested by the event form: ticked built-in checkboxes (always
+    required) followed by the custom_id[] / custom_label[] / custom_type[] /
+    custom_required[] rows.
+    """
+    specs = [
+        FieldSpec(None, label, field_type, True)
+        for label, field_type in BUILTIN_FIELDS.items() if post.get(label)
+    ]
+    ids = post.getlist('custom_id[]')
+    types = post.getlist('custom_type[]')
+    required = post.getlist('custom_required[]')
+    valid_types = dict(FIELD_TYPES)
+    for i, label in enumerate(post.getlist('custom_label[]')):
+        label = label.strip()
+        if not label:
+            continue
+        field_id = ids[i] if i < len(ids) else ''
+        field_type = types[i].strip() if i < len(types) else 'text'
+        specs.append(FieldSpec(
+            int(field_id) if field_id.isdigit() else None,
+            label,
+            field_type if field_type in valid_types else 'text',
+            i < len(required) and required[i] == 'on',
+        ))
+
+    seen = set()
+    for spec in specs:
+        if spec.label in seen:
+            raise ValidationError(f'The field "{spec.label}" is listed more than once.')
+        seen.add(spec.label)
+    return specs
+
+
+def apply_field_changes(event, specs):
+    """Make `event`'s custom fields match `specs`. Returns counts of created, updated and deleted fields."""
+    existing = {field.id: field for field in event.custom_fields.all()}
+    by_label = {field.label: field for field in existing.values()}
+    # Explicit ids first, then labels, so a renamed row can't lose its field to a label match
+    matches = {}
+    for i, spec in enumerate(specs):
+        if spec.id in existing and existing[spec.id] not in matches.values():
+            matches[i] = existing[spec.id]
+    for i, spec in enumerate(specs):
+        field = by_label.get(spec.label)
+        if i not in matches and spec.id is None and field is not None and field not in matches.values():
+            matches[i] = field
+
+    to_create, to_update, renames = [], [], {}
+    for i, spec in enumerate(specs):
+        field = matches.get(i)
+        if field is None:
+            to_create.append(CustomField(
+                event=event, label=spec.label, field_type=spec.field_type, required=spec.required
+            ))
+        elif (field.label, field.field_type, field.required) != (spec.label, spec.field_type, spec.required):
+            if field.label != spec.label:
+                renames[field.label] = spec.label
+            field.label, field.field_type, field.required = spec.label, spec.field_type, spec.required
+            to_update.append(field)
+    kept = {field.id for field in matches.values()}
+    to_delete = [field_id for field_id in existing if field_id not in kept]
+
+    if to_create or to_update or to_delete:
+        with transaction.atomic():
+            if to_delete:
+                CustomField.objects.filter(id__in=to_delete).delete()
+            CustomField.objects.bulk_update(to_update, ['label', 'field_type', 'required'])
+            CustomField.objects.bulk_create(to_create)
+            if renames:
+                rename_answers(event, renames)
+            # Bulk operations skip CustomField.save()/delete(), so bump once here
+            Event.objects.filter(pk=event.pk).bump_schema_version()
+
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(to_delete)}
+
+
+def rename_answers(event, renames):
+    """Re-key stored answers from old to new labels (swaps included)."""
+    for model in (Registration, WaitlistEntry):
+        rows = model.objects.filter(event=event, responses__has_any_keys=list(renames)).only('id', 'responses')
+        batch = []
+        for row in rows.iterator(chunk_size=ANSWER_REWRITE_CHUNK_SIZE):
+            row.responses = {renames.get(label, label): value for label, value in row.responses.items()}
+            batch.append(row)
+            if len(batch) == ANSWER_REWRITE_CHUNK_SIZE:
+                model.objects.bulk_update(batch, ['responses'])
+                batch = []
+        model.objects.bulk_update(batch, ['responses'])
@@ -0,0 +1,134 @@
+"""
+Full-text search over events.
+
+The active backend is picked by the EVENT_SEARCH_BACKEND setting (a dotted path).
+When it isn't set, SQLite databases use the FTS5 index and anything else falls
+back to a plain substring scan. A Postgres tsvector backend only has to implement
+the SearchBackend methods below.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+FTS_TABLE = 'events_event_fts'
+
+
+def search_terms(query):
+    """Split a user query into plain word tokens (drops FTS operators and quotes)."""
+    return re.findall(r'\w+', query or '')
+
+
+class SearchBackend:
+    """Interface every search backend implements."""
+
+    def index(self, events):
+        """Add or refresh the index entries for an iterable of events."""
+        raise NotImplementedError
+
+    def remove(self, event_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Drop and rebuild the whole index from the Event table."""
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        """Filter an Event queryset to matches of `query`, best matches first."""
+        raise NotImplementedError
+
+
+class SubstringBackend(SearchBackend):
+    """Unindexed fallback: case-insensitive substring match, no ranking."""
+
+    def index(self, events):
+        pass
+
+    def remove(self, event_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, query):
+        for term in search_terms(query):
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term) |
+                Q(category__name__icontains=term) | Q(location__icontains=term)
+            )
+        return queryset
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """
+    Keeps an FTS5 virtual table (created in migration 0033) keyed by event id.
+    Results are ranked with bm25(), title matches weighing the most, and every
+    term is matched as a prefix so "pyth" finds "python".
+    """
+    # bm25 column weights: title, description, category, location
+    weights = (10.0, 1.0, 4.0, 2.0)
+
+    def index(self, events):
+        rows = [
+            (event.pk, event.title, event.description, event.category.name, event.location)
+            for event in events
+        ]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, category, location) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove(self, event_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in event_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, category, location) "
+                "SELECT e.id, e.title, e.description, c.name, e.location "
+                "FROM events_event e JOIN events_category c ON c.id = e.category_id"
+            )
+
+    def match_expression(self, query):
+        return ' '.join(f'"{term}"*' for term in search_terms(query))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(str(w) for w in self.weights)
+        # Join the index once; bm25() is then computed by the same MATCH that filters
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {queryset.model._meta.db_table}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+            select={'search_rank': f"bm25({FTS_TABLE}, {weights})"},
+        ).order_by('search_rank', *queryset.query.order_by)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'EVENT_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTS5Backend()
+        else:
+            _backend = SubstringBackend()
+    return _backend
+
+
+def search_events(queryset, query):
+    return get_backend().search(queryset, query)
@@ -0,0 +1,148 @@
+"""
+Capacity-enforcing registration.
+
+reserve_seat() takes a seat with one conditional UPDATE
+(registered_count < max_participants), so concurrent registrations can never
+oversell an event however they interleave, and a full event costs exactly that
+one statement. A seat is only free to a newcomer while nobody is waiting for
+one (a NOT EXISTS on the waitlist's (event, ticket) index), so a seat that
+opens up goes to the head of the waitlist rather than to whoever registers
+next. The condition also lets through a user who is already registered (an
+EXISTS on the (event, user) unique index in the same UPDATE), so a repeat
+submit goes on to hit the unique constraint and is reported as such rather
+than as FULL; the rollback gives its seat back.
+
+Full events keep a FIFO waitlist. Every waitlist change for an event starts by
+updating that event's row, so concurrent joins, withdrawals and promotions are
+serialized on it and tickets stay contiguous. Seats freed by a deleted
+registration or added by raising max_participants are filled from the
+waitlist by the signals in signals.py, whatever did the deleting or editing.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, Min, OuterRef, Q
+
+from .models import Event, Registration, WaitlistEntry
+from .answers import record_answers
+from .checkin import checkin_qr_attachment
+from .outbox import enqueue_email
+
+RESERVED = 'reserved'
+FULL = 'full'
+ALREADY_REGISTERED = 'already_registered'
+
+
+def take_seat(event_id, user_id=None):
+    """
+    Atomically claim one seat; False when the event is already full. With a
+    `user_id` (a newcomer rather than a promotion) the seat must also not be
+    owed to the waitlist, but a user who already holds a registration always
+    gets through, to fail on the unique constraint instead.
+    """
+    has_room = Q(registered_count__lt=F('max_participants'))
+    if user_id is not None:
+        has_room &= ~Exists(WaitlistEntry.objects.filter(event_id=OuterRef('pk')))
+        has_room |= Exists(Registration.objects.filter(event_id=OuterRef('pk'), user_id=user_id))
+    return bool(Event.objects.filter(has_room, pk=event_id).update(registered_count=F('registered_count') + 1))
+
+
+def reserve_seat(registration):
+    """Save `registration` if its event has a free seat. Returns RESERVED, FULL or ALREADY_REGISTERED."""
+    try:
+        with transaction.atomic():
+            if not take_seat(registration.event_id, registration.user_id):
+                return FULL
+            # The seat is already counted; tell the post_save counter not to add it again
+            registration._seat_counted = True
+            registration.save()
+    except IntegrityError:
+        # Duplicate (event, user): the savepoint rollback also gives the seat back
+        return ALREADY_REGISTERED
+    return RESERVED
+
+
+def join_waitlist(registration):
+    """Queue a registration that didn't get a seat. Joining twice returns the existing entry."""
+    event_id = registration.event_id
+    try:
+        with transaction.atomic():
+            Event.objects.filter(pk=event_id).update(waitlist_seq=F('waitlist_seq') + 1)
+            ticket = Event.objects.values_list('waitlist_seq', flat=True).get(pk=event_id)
+            return WaitlistEntry.objects.create(
+                event_id=event_id,
+                user_id=registration.user_id,
+                ticket=ticket,
+                name=registration.name,
+                email=registration.email,
+                responses=registration.responses,
+            )
+    except IntegrityError:
+        return WaitlistEntry.objects.get(event_id=event_id, user_id=registration.user_id)
+
+
+def waitlist_position(entry):
+    """1-based place in the queue, from two (event, ticket) index seeks."""
+    head = WaitlistEntry.objects.filter(event_id=entry.event_id).aggregate(head=Min('ticket'))['head']
+    return entry.ticket - head + 1
+
+
+def leave_waitlist(event_id, user_id):
+    with transaction.atomic():
+        Event.objects.filter(pk=event_id, waitlist_seq__gt=0).update(waitlist_seq=F('waitlist_seq') - 1)
+        entry = WaitlistEntry.objects.filter(event_id=event_id, user_id=user_id).first()
+        if entry is None:
+            transaction.set_rollback(True)
+            return False
+        entry.delete()
+        # Close the gap so positions stay ticket - head + 1
+        WaitlistEntry.objects.filter(event_id=event_id, ticket__gt=entry.ticket).update(ticket=F('ticket') - 1)
+    return True
+
+
+def promote_from_waitlist(event):
+    """
+    Fill free seats from the head of the waitlist, within the caller's
+    transaction, and queue a notification for everyone promoted. Called from
+    the Registration post_delete and Event post_save signals.
+    """
+    promoted = []
+    while True:
+        with transaction.atomic():
+            if not take_seat(event.pk):
+                break
+            entry = WaitlistEntry.objects.filter(event_id=event.pk).order_by('ticket').first()
+            if entry is None:
+                # Nobody waiting: hand the seat straight back
+                transaction.set_rollback(True)
+                break
+            entry.delete()
+            registration = Registration(
+                event_id=event.pk, user_id=entry.user_id, name=entry.name,
+                email=entry.email, responses=entry.responses,
+            )
+            registration._seat_counted = True
+            try:
+                with transaction.atomic():
+                    registration.save()
+                    record_answers(registration)
+            except IntegrityError:
+                # Registered some other way meanwhile: drop the entry and free the seat again
+                Event.objects.filter(pk=event.pk).update(registered_count=F('registered_count') - 1)
+                continue
+            enqueue_email(
+                subject=f'You have a seat at {event.title}',
+                body=f"""Hi {registration.name},
+
+Good news! A seat opened up for {event.title} and you have been moved off the waitlist.
+You are now registered. Show the attached QR code at the door to check in.
+
+📅 Date: {event.date.strftime('%A, %d %B %Y at %I:%M %p')}
+📍 Location: {event.location}
+
+Best regards,
+Event Team
+""",
+                to=[registration.email],
+                attachments=[checkin_qr_attachment(registration)],
+            )
+            promoted.append(registration)
+    return promoted
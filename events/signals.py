@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import adjust_unread_count, invalidate_home_cache
+from .models import (
+    Category, Conversation, Event, EventFeedback, Message, Registration, RegistrationActivity, WaitlistEntry,
+)
+from .realtime import publish_message
+from .rollups import record_activity
+from .seats import promote_from_waitlist
+from .summaries import request_summary
+from .search import get_backend
+
+
+# Keep the event search index in sync. Fixture loads (raw=True) are skipped;
+# run `manage.py rebuild_search_index` afterwards.
+@receiver(post_save, sender=Event)
+def index_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index([instance])
+
+@receiver(post_delete, sender=Event)
+def unindex_event(sender, instance, **kwargs):
+    get_backend().remove([instance.pk])
+
+@receiver(post_save, sender=Category)
+def reindex_category_events(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        get_backend().index(Event.objects.filter(category=instance).select_related('category'))
+
+
+@receiver([post_save, post_delete], sender=Event)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_home(sender, **kwargs):
+    invalidate_home_cache()
+
+
+# Registrations deleted along with their event (deleting the event itself, or its
+# organizer) are not cancellations. Every pre_delete of a delete() call runs before
+# any post_delete, and they all share its `origin`, so the events are noted there.
+@receiver(pre_delete, sender=Event)
+def note_deleted_event(sender, instance, origin=None, **kwargs):
+    if origin is not None:
+        if not hasattr(origin, '_deleted_event_ids'):
+            origin._deleted_event_ids = set()
+        origin._deleted_event_ids.add(instance.pk)
+
+def deleted_with_event(registration, origin):
+    return registration.event_id in getattr(origin, '_deleted_event_ids', ())
+
+
+# Event.registered_count is a denormalized Registration count. Both updates are a
+# single UPDATE ... SET registered_count = registered_count +/- 1, so concurrent
+# registrations and cancellations never overwrite each other.
+@receiver(post_save, sender=Registration)
+def increment_registered_count(sender, instance, created=False, raw=False, **kwargs):
+    # seats.reserve_seat() counts the seat itself as part of its capacity check.
+    # Fixture loads (raw=True) carry their own registered_count.
+    if created and not raw and not getattr(instance, '_seat_counted', False):
+        Event.objects.filter(pk=instance.event_id).update(registered_count=F('registered_count') + 1)
+
+@receiver(post_delete, sender=Registration)
+def decrement_registered_count(sender, instance, origin=None, **kwargs):
+    if not deleted_with_event(instance, origin):
+        Event.objects.filter(pk=instance.event_id, registered_count__gt=0).update(
+            registered_count=F('registered_count') - 1
+        )
+
+
+# Seats that open up go to the head of the waitlist (see seats.py), in the same
+# transaction that freed or added them: cancellations, admin deletes and
+# delete_duplicates free a seat, raising max_participants adds some. Runs after
+# decrement_registered_count above, so the freed seat is already counted out.
+@receiver(post_delete, sender=Registration)
+def fill_freed_seat(sender, instance, origin=None, **kwargs):
+    if not deleted_with_event(instance, origin) and WaitlistEntry.objects.filter(event_id=instance.event_id).exists():
+        promote_from_waitlist(Event.objects.get(pk=instance.event_id))
+
+@receiver(post_save, sender=Event)
+def fill_added_seats(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if created or raw or (update_fields is not None and 'max_participants' not in update_fields):
+        return
+    if WaitlistEntry.objects.filter(event_id=instance.pk).exists():
+        promote_from_waitlist(instance)
+
+
+# Activity for the dashboard's daily rollups (see rollups.py)
+@receiver(post_save, sender=Registration)
+def log_registration(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        record_activity(instance.event_id, RegistrationActivity.REGISTERED)
+
+@receiver(post_delete, sender=Registration)
+def log_cancellation(sender, instance, origin=None, **kwargs):
+    if not deleted_with_event(instance, origin):
+        record_activity(instance.event_id, RegistrationActivity.CANCELLED)
+
+
+# Event rating aggregates (rating_count, rating_sum, rating_average, rating_1..5),
+# each change a single F() UPDATE like registered_count above
+@receiver(pre_save, sender=EventFeedback)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk and not instance._state.adding:
+        # Locked until commit, so concurrent edits of one row move its rating in turn
+        # rather than both taking back the same previous rating
+        instance._previous_rating = (
+            EventFeedback.objects.select_for_update().filter(pk=instance.pk).values_list('rating', flat=True).first()
+        )
+
+@receiver(post_save, sender=EventFeedback)
+def add_rating(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    event = Event.objects.filter(pk=instance.event_id)
+    previous = getattr(instance, '_previous_rating', None)
+    if created:
+        event.adjust_rating(instance.rating, 1)
+    elif previous is not None and previous != instance.rating:
+        event.adjust_rating(previous, -1)
+        event.adjust_rating(instance.rating, 1)
+
+@receiver(post_delete, sender=EventFeedback)
+def remove_rating(sender, instance, **kwargs):
+    Event.objects.filter(pk=instance.event_id, rating_count__gt=0).adjust_rating(instance.rating, -1)
+
+
+# Background AI summaries (see summaries.py): the page keeps serving the last
+# good summary until the worker has caught up with the new feedback
+@receiver(post_save, sender=EventFeedback)
+def request_feedback_summary(sender, instance, raw=False, **kwargs):
+    if not raw:
+        request_summary(instance.event_id)
+
+@receiver(post_delete, sender=EventFeedback)
+def request_summary_after_delete(sender, instance, **kwargs):
+    request_summary(instance.event_id, create=False)
+
+
+# Conversation rows hold the inbox and the per-pair unread counts; the badge reads
+# a cached per-user total (cache.py) adjusted alongside them. Fixture loads
+# (raw=True) are skipped; run `manage.py backfill_conversations` afterwards.
+@receiver(post_save, sender=Message)
+def update_conversation(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        Conversation.record_message(instance)
+        if not instance.is_read:
+            transaction.on_commit(lambda: adjust_unread_count(instance.receiver_id, 1))
+        transaction.on_commit(lambda: publish_message(instance))
+
+@receiver(post_delete, sender=Message)
+def uncount_deleted_message(sender, instance, **kwargs):
+    if not instance.is_read:
+        Conversation.mark_read(instance.receiver_id, instance.sender_id, 1)
+        transaction.on_commit(lambda: adjust_unread_count(instance.receiver_id, -1))
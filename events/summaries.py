@@ -0,0 +1,211 @@
+"""
+AI summaries of event feedback.
+
+EventDetailView only reads FeedbackSummary, so a page render never waits on
+a model. It serves the last good summary, or a placeholder until the first
+one exists. Feedback changes mark the event's summary as requested
+(signals.py). `manage.py generate_feedback_summaries` then claims requested
+rows and hashes each event's current feedback. It calls the backend only
+when that hash differs from the one the stored summary was made from. A
+failed call keeps the old text and is retried with the outbox's backoff, up
+to MAX_ATTEMPTS times. After that the request is dropped until the feedback
+changes again, so a bad event doesn't keep calling a paid API.
+
+The backend is picked by the FEEDBACK_SUMMARY_BACKEND setting (a dotted
+path). When it isn't set, RemoteLLMBackend is used if OPENAI_API_KEY is
+configured and ExtractiveBackend otherwise.
+"""
+import hashlib
+import logging
+import re
+from collections import Counter
+from datetime import timedelta
+
+# Install: pip install openai
+import openai
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import EventFeedback, FeedbackSummary
+from .outbox import MAX_ATTEMPTS, backoff
+
+logger = logging.getLogger(__name__)
+
+# How long a worker owns the summaries it claimed before another worker may retry them
+CLAIM_LEASE_SECONDS = 10 * 60
+
+
+class SummaryBackend:
+    """Interface every summary backend implements."""
+
+    def summarize(self, event, feedback):
+        """A short summary of `feedback` (a non-empty list of EventFeedback). Raise on failure."""
+        raise NotImplementedError
+
+
+class RemoteLLMBackend(SummaryBackend):
+    """Chat completion through the OpenAI API."""
+    model = 'gpt-3.5-turbo'
+    max_tokens = 150
+    timeout = 30
+
+    def summarize(self, event, feedback):
+        feedback_text = " ".join(f.comment for f in feedback)
+        prompt = f"""
+        Generate a brief summary of the event "{event.title}" based on participant feedback:
+
+        Event Description: {event.description}
+        Category: {event.category.name}
+        Participant Feedback: {feedback_text}
+
+        Provide a 2-3 sentence summary highlighting key strengths and areas mentioned by participants.
+        """
+        client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, timeout=self.timeout)
+        response = client.chat.completions.create(
+            model=getattr(settings, 'FEEDBACK_SUMMARY_MODEL', self.model),
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=self.max_tokens,
+        )
+        return response.choices[0].message.content.strip()
+
+
+STOPWORDS = frozenset(
+    'a about all also an and are as at be been but by can could did do for from had has have he her his i if in '
+    'into is it its just me more my no not of on one or our out she so some than that the their them then there '
+    'they this to too us very was we were what when which who will with would you your'.split()
+)
+
+
+def content_words(text):
+    return [word for word in re.findall(r"[a-z0-9']+", text.lower()) if word not in STOPWORDS]
+
+
+class ExtractiveBackend(SummaryBackend):
+    """
+    Local and offline: the average rating plus the comment sentences whose words
+    come up most often across all of the event's feedback.
+    """
+    sentence_count = 2
+
+    def summarize(self, event, feedback):
+        sentences = list(dict.fromkeys(
+            sentence.strip()
+            for row in feedback
+            for sentence in re.split(r'(?<=[.!?])\s+', row.comment)
+            if content_words(sentence)
+        ))
+        # How many sentences mention each word
+        frequency = Counter(word for sentence in sentences for word in set(content_words(sentence)))
+
+        def score(sentence):
+            words = content_words(sentence)
+            return sum(frequency[word] for word in words) / len(words)
+
+        best = sorted(range(len(sentences)), key=lambda i: (-score(sentences[i]), i))[:self.sentence_count]
+        average = sum(row.rating for row in feedback) / len(feedback)
+        summary = f"Rated {average:.1f}/5 by {len(feedback)} participant{'s' if len(feedback) != 1 else ''}."
+        if best:
+            summary += ' Participants said: ' + ' '.join(f'"{sentences[i]}"' for i in sorted(best))
+        return summary
+
+
+class StubBackend(SummaryBackend):
+    """Deterministic output for tests."""
+
+    def summarize(self, event, feedback):
+        average = sum(row.rating for row in feedback) / len(feedback)
+        return f"{len(feedback)} reviews of {event.title}, average {average:.1f}."
+
+
+def get_backend():
+    path = getattr(settings, 'FEEDBACK_SUMMARY_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if getattr(settings, 'OPENAI_API_KEY', ''):
+        return RemoteLLMBackend()
+    return ExtractiveBackend()
+
+
+def feedback_hash(feedback):
+    """sha256 over (id, rating, comment) of every row, in id order."""
+    digest = hashlib.sha256()
+    for row in feedback:
+        digest.update(f'{row.id}:{row.rating}:{row.comment}\0'.encode())
+    return digest.hexdigest()
+
+
+def request_summary(event_id, create=True):
+    """
+    Mark the event's summary for regeneration. Call inside the transaction that
+    changed its feedback. create=False only touches an existing row; deleting an
+    event deletes its feedback, and must not create a summary on the way out.
+    """
+    now = timezone.now()
+    if not FeedbackSummary.objects.filter(event_id=event_id).update(requested_at=now, attempts=0) and create:
+        FeedbackSummary.objects.get_or_create(event_id=event_id, defaults={'requested_at': now})
+
+
+def summary_for(event):
+    """(last good summary text or '', whether a newer one is on its way) for the detail page."""
+    summary = FeedbackSummary.objects.filter(event=event).only('text', 'requested_at').first()
+    if summary is None:
+        return '', False
+    return summary.text, summary.requested_at is not None
+
+
+def claim_batch(batch_size):
+    """Claim up to `batch_size` requested summaries by moving requested_at to the end of a lease."""
+    now = timezone.now()
+    lease = now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+    due = list(
+        FeedbackSummary.objects.filter(requested_at__lte=now)
+        .order_by('requested_at').values_list('event_id', flat=True)[:batch_size]
+    )
+    FeedbackSummary.objects.filter(event_id__in=due, requested_at__lte=now).update(requested_at=lease)
+    return list(FeedbackSummary.objects.filter(event_id__in=due, requested_at=lease).select_related('event__category'))
+
+
+def refresh_summary(summary, backend, max_attempts=MAX_ATTEMPTS):
+    """
+    Regenerate one claimed summary if its feedback changed. Returns 'generated',
+    'unchanged', 'retried' or, once `max_attempts` calls have failed, 'dead'.
+    """
+    event = summary.event
+    claimed = FeedbackSummary.objects.filter(event_id=event.pk, requested_at=summary.requested_at)
+    feedback = list(EventFeedback.objects.filter(event=event).order_by('id').only('id', 'rating', 'comment'))
+    digest = feedback_hash(feedback)
+
+    result = 'unchanged'
+    if digest != summary.feedback_hash:
+        try:
+            text = backend.summarize(event, feedback) if feedback else ''
+        except Exception as e:
+            attempts = summary.attempts + 1
+            last_error = f"{type(e).__name__}: {e}"
+            if attempts >= max_attempts:
+                # Dropped until the feedback changes again; request_summary() resets attempts
+                claimed.update(requested_at=None, attempts=attempts, last_error=last_error)
+                logger.error("Feedback summary for event %s dead-lettered: %s", event.pk, last_error)
+                return 'dead'
+            claimed.update(requested_at=timezone.now() + backoff(attempts), attempts=attempts, last_error=last_error)
+            logger.warning("Feedback summary for event %s failed (attempt %s): %s", event.pk, attempts, e)
+            return 'retried'
+        FeedbackSummary.objects.filter(event_id=event.pk).update(
+            text=text, feedback_hash=digest, backend=type(backend).__name__,
+            generated_at=timezone.now(), attempts=0, last_error='',
+        )
+        result = 'generated'
+    # Feedback that arrived meanwhile moved requested_at off our lease, so that stays pending
+    claimed.update(requested_at=None)
+    return result
+
+
+def generate_batch(batch_size=20, max_attempts=MAX_ATTEMPTS):
+    """Refresh one batch of requested summaries. Returns (generated, unchanged, retried, dead)."""
+    summaries = claim_batch(batch_size)
+    if not summaries:
+        return 0, 0, 0, 0
+    backend = get_backend()
+    results = Counter(refresh_summary(summary, backend, max_attempts) for summary in summaries)
+    return results['generated'], results['unchanged'], results['retried'], results['dead']
@@ -1,3 +1,1472 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import importlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core import mail, serializers
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q, Sum
+from django.http import QueryDict
+from django.db.models.functions import Lower
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    User, Category, Conversation, CustomField, Event, EventDailyStats, EventFeedback, EventRegistration, FeedbackSummary, Message, OutboxEmail, Registration, RegistrationActivity, RegistrationAnswer,
+    WaitlistEntry,
+)
+from .outbox import deliver_batch, enqueue_email
+from .answers import facet_counts, record_answers
+from .cache import cache_stats, check_shared_cache, get_categories, get_home_events
+from .attendance import check_in_by_ids
+from .realtime import InProcessBroker
+from .rollups import fold_batch
+from .search import search_events
+from .summaries import ExtractiveBackend, StubBackend, generate_batch, request_summary
+from .reports import ATTENDED, DAY, RegistrantReport
+from .checkin import ALREADY_CHECKED_IN, CHECKED_IN, INVALID, NOT_FOUND, make_checkin_token, read_checkin_token
+from .checkin import scan as scan_token
+from .schema import apply_field_changes, fields_from_post
+from .views import CHAT_WINDOW, PREFIX_RANGE_END, RECEIVER_SEARCH_LIMIT
+from .seats import ALREADY_REGISTERED, FULL, RESERVED, join_waitlist, reserve_seat, waitlist_position
+
+
+class EventStatusFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        cls.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.event = Event.objects.create(
+            title='Talk', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=cls.start, start_time=cls.start, duration=90, location='Hall A', max_participants=10,
+            registration_link='https://example.com',
+        )
+
+    def test_filters_agree_with_status_at_boundaries(self):
+        end = self.start + timedelta(minutes=90)
+        tick = timedelta(microseconds=1)
+        events = Event.objects.filter(pk=self.event.pk)
+        for now in (
+            self.start - tick, self.start, self.start + tick, end - tick, end, end + tick,
+            end + timedelta(hours=5) - tick, end + timedelta(hours=5), end + timedelta(hours=5) + tick,
+        ):
+            with self.subTest(now=now), mock.patch('django.utils.timezone.now', return_value=now):
+                status = events.get().status
+                matching = [name for name in ('upcoming', 'ongoing', 'completed') if getattr(events, name)(now=now).exists()]
+                self.assertEqual(matching, [status])
+                recent = now < end + timedelta(hours=5)
+                self.assertEqual(events.recently_completed(now=now).exists(), status == 'completed' and recent)
+                self.assertEqual(events.active_or_recent(now=now).exists(), status != 'completed' or recent)
+
+    def test_save_keeps_end_time_in_step(self):
+        event = Event.objects.get(pk=self.event.pk)
+        self.assertEqual(event.end_time, self.start + timedelta(minutes=90))
+
+        event.duration = 30
+        event.save(update_fields=['duration'])
+        event.start_time += timedelta(hours=1)
+        event.save()
+        event.refresh_from_db()
+        self.assertEqual(event.end_time, self.start + timedelta(minutes=90))
+
+    def test_migration_backfills_end_time_in_sql(self):
+        Event.objects.update(end_time=self.start)
+        migration = importlib.import_module('events.migrations.0048_event_end_time')
+        with CaptureQueriesContext(connection) as queries:
+            migration.backfill_end_time(apps, None)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).end_time, self.start + timedelta(minutes=90))
+
+
+class EventListKeysetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='participant', user_type='participant')
+        category = Category.objects.create(name='Technical')
+        start = timezone.now() + timedelta(days=1)
+        # Pairs of events share a date, so pages have to break ties on id
+        cls.events = [
+            Event.objects.create(
+                title=f'Event {i}', description='', organizer=cls.user, category=category,
+                date=start + timedelta(hours=i // 2), start_time=start, location='Hall A', max_participants=10,
+                registration_link='https://example.com',
+            )
+            for i in range(13)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def page(self, after):
+        response = self.client.get(reverse('event_list'), {'after': after})
+        self.assertEqual(response.status_code, 200)
+        return [event.pk for event in response.context['events']], response.context['next_cursor']
+
+    def test_cursor_walks_every_event_once_in_order(self):
+        first, cursor = self.page('')
+        self.assertEqual(len(first), 10)
+        self.assertIsNotNone(cursor)
+
+        last, cursor = self.page(cursor)
+        self.assertIsNone(cursor)
+        self.assertEqual(first + last, [event.pk for event in self.events])
+
+    def test_cursor_at_the_end_gives_an_empty_last_page(self):
+        last = self.events[-1]
+        self.assertEqual(self.page(f'{last.date.isoformat()}~{last.pk}'), ([], None))
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        for cursor in ('garbage', '2026-01-01T00:00:00~x', 'not-a-date~3'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('event_list'), {'after': cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'The default search backend is FTS5 on SQLite only')
+class EventSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        cls.category = Category.objects.create(name='Technical')
+        now = timezone.now()
+
+        def event(title, description):
+            return Event.objects.create(
+                title=title, description=description, organizer=organizer, category=cls.category, date=now,
+                start_time=now, location='Hall A', max_participants=10, registration_link='https://example.com',
+            )
+
+        cls.in_description = event('Data workshop', 'Notebooks in Python for beginners')
+        cls.in_title = event('Python meetup', 'Talks and pizza')
+        cls.unrelated = event('Chess club', 'Weekly games')
+
+    def search(self, query):
+        return list(search_events(Event.objects.order_by('id'), query))
+
+    def test_terms_match_as_prefixes_best_match_first(self):
+        # Title matches outweigh description matches in bm25()
+        self.assertEqual(self.search('pyth'), [self.in_title, self.in_description])
+        self.assertEqual(self.search('python begin'), [self.in_description])
+
+    def test_queries_without_terms_match_nothing(self):
+        for query in ('', '   ', '"', '""*"', '-'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [])
+
+    def test_index_follows_event_saves_and_deletes(self):
+        self.unrelated.title = 'Rust meetup'
+        self.unrelated.save()
+        self.assertEqual(self.search('rust'), [self.unrelated])
+        self.assertEqual(self.search('chess'), [])
+
+        self.category.name = 'Hackathons'
+        self.category.save()
+        self.assertEqual(len(self.search('hackath')), 3)
+
+        self.in_title.delete()
+        self.assertEqual(self.search('pyth'), [self.in_description])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM events_event_fts WHERE rowid = %s', [self.in_title.pk])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_rebuild_command_restores_the_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM events_event_fts')
+        self.assertEqual(self.search('pyth'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.search('pyth'), [self.in_title, self.in_description])
+
+
+class RegisteredCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Talk', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Hall A', max_participants=10,
+            registration_link='https://example.com',
+        )
+        cls.users = [User.objects.create(username=f'p{i}', user_type='participant') for i in range(3)]
+
+    def register(self, user):
+        return Registration.objects.create(event=self.event, user=user, name=user.username, email='p@example.com')
+
+    def registered_count(self):
+        return Event.objects.values_list('registered_count', flat=True).get(pk=self.event.pk)
+
+    def test_counter_follows_creates_and_deletes(self):
+        registrations = [self.register(user) for user in self.users]
+        self.assertEqual(self.registered_count(), 3)
+        registrations[0].delete()
+        self.assertEqual(self.registered_count(), 2)
+
+    def test_event_save_does_not_overwrite_counter(self):
+        stale = Event.objects.get(pk=self.event.pk)
+        self.register(self.users[0])
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.registered_count(), 1)
+
+    def test_fixture_loads_are_not_counted(self):
+        registration = Registration(
+            pk=1000, event=self.event, user=self.users[0], name='p0', email='p@example.com', registered_at=timezone.now(),
+        )
+        for obj in serializers.deserialize('json', serializers.serialize('json', [registration])):
+            obj.save()
+        self.assertTrue(Registration.objects.filter(pk=1000).exists())
+        self.assertEqual(self.registered_count(), 0)
+
+    def test_migration_backfills_from_registrations(self):
+        for user in self.users[:2]:
+            self.register(user)
+        Event.objects.update(registered_count=0)
+        migration = importlib.import_module('events.migrations.0034_event_registered_count')
+        migration.backfill_registered_count(apps, None)
+        self.assertEqual(self.registered_count(), 2)
+
+
+class HomeCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        cls.category = Category.objects.create(name='Technical')
+        cls.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        cls.event = Event.objects.create(
+            title='Talk', description='', organizer=organizer, category=cls.category, date=cls.start,
+            start_time=cls.start, duration=60, location='Hall A', max_participants=10,
+            registration_link='https://example.com',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hits_and_misses_are_counted(self):
+        for i in range(3):
+            get_home_events()
+        get_categories()
+        self.assertEqual(cache_stats(), {'hits': 2, 'misses': 2, 'hit_rate': 0.5})
+
+    def test_event_and_category_saves_invalidate(self):
+        self.assertEqual([event.title for event in get_home_events()], ['Talk'])
+        self.assertEqual([category.name for category in get_categories()], ['Technical'])
+
+        self.event.title = 'Renamed'
+        self.event.save()
+        self.assertEqual([event.title for event in get_home_events()], ['Renamed'])
+
+        self.category.name = 'Workshops'
+        self.category.save()
+        self.assertEqual([category.name for category in get_categories()], ['Workshops'])
+
+    def test_event_entries_expire_at_the_next_status_transition(self):
+        end = self.start + timedelta(hours=1)
+        for now, transition in (
+            (self.start - timedelta(minutes=10), self.start),
+            (self.start + timedelta(minutes=30), end),
+            (end + timedelta(hours=4, minutes=50), end + timedelta(hours=5)),
+        ):
+            cache.clear()
+            with self.subTest(now=now), mock.patch('django.utils.timezone.now', return_value=now), \
+                    mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+                get_home_events()
+                self.assertEqual(cache_set.call_args.kwargs['timeout'], (transition - now).total_seconds() + 1)
+
+    def test_migration_creates_the_cache_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE events_cache')
+        self.assertNotIn('events_cache', connection.introspection.table_names())
+        migration = importlib.import_module('events.migrations.0050_create_cache_table')
+        migration.create_cache_table(apps, connection.schema_editor())
+        self.assertIn('events_cache', connection.introspection.table_names())
+        self.assertEqual([event.title for event in get_home_events()], ['Talk'])
+
+    def test_cache_outage_does_not_abort_saves(self):
+        with mock.patch.object(cache, 'incr', side_effect=OSError('cache down')), \
+                self.assertLogs('events.cache', 'ERROR'):
+            self.event.title = 'Renamed'
+            self.event.save()
+        self.assertEqual(Event.objects.get(pk=self.event.pk).title, 'Renamed')
+
+    def test_per_process_cache_is_flagged(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['events.W001'])
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class UnreadCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create(username='alice', user_type='participant')
+        cls.bob = User.objects.create(username='bob', user_type='participant')
+        cls.carol = User.objects.create(username='carol', user_type='participant')
+
+    def setUp(self):
+        cache.clear()
+
+    def badge(self, user):
+        self.client.force_login(user)
+        return self.client.get(reverse('home')).context['unread_message_count']
+
+    def send(self, sender, receiver):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(sender=sender, receiver=receiver, content='Hi')
+
+    def test_badge_is_cached_and_kept_in_step(self):
+        for sender in (self.alice, self.alice, self.carol):
+            self.send(sender, self.bob)
+        self.send(self.bob, self.alice)
+        self.assertEqual(self.badge(self.bob), 3)
+        self.assertEqual(self.badge(self.alice), 1)
+
+        # Counters already cached are adjusted in place, without recounting
+        with mock.patch.object(Conversation.objects, 'unread_count') as unread_count:
+            self.send(self.carol, self.bob)
+            self.assertEqual(self.badge(self.bob), 4)
+            self.client.force_login(self.bob)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(reverse('conversation', args=[self.alice.id]))
+            self.assertEqual(self.badge(self.bob), 2)
+        unread_count.assert_not_called()
+
+        # A missing counter falls back to the Conversation table
+        cache.clear()
+        self.assertEqual(self.badge(self.bob), 2)
+
+    def test_deleting_an_unread_message_uncounts_it(self):
+        message = self.send(self.alice, self.bob)
+        self.send(self.alice, self.bob)
+        self.assertEqual(self.badge(self.bob), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            message.delete()
+        self.assertEqual(self.badge(self.bob), 1)
+        self.assertEqual(Conversation.objects.unread_count(self.bob.id), 1)
+
+    def test_reconcile_repairs_drifted_counts(self):
+        self.send(self.alice, self.bob)
+        self.send(self.bob, self.carol)
+        Message.objects.create(sender=self.carol, receiver=self.bob, content='Read', is_read=True)
+        self.assertEqual(self.badge(self.bob), 1)
+        Conversation.objects.update(unread_low=7, unread_high=7)
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_unread_counts', stdout=out)
+        self.assertIn('Checked 2 conversations, repaired 2.', out.getvalue())
+        self.assertEqual(
+            {user.username: Conversation.objects.unread_count(user.id) for user in (self.alice, self.bob, self.carol)},
+            {'alice': 0, 'bob': 1, 'carol': 1},
+        )
+        self.assertEqual(self.badge(self.bob), 1)
+
+    def test_fixture_loads_are_not_counted(self):
+        message = Message(pk=1000, sender=self.alice, receiver=self.bob, content='Hi', timestamp=timezone.now())
+        for obj in serializers.deserialize('json', serializers.serialize('json', [message])):
+            obj.save()
+        self.assertTrue(Message.objects.filter(pk=1000).exists())
+        self.assertEqual(self.badge(self.bob), 0)
+
+
+class ConversationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create(username='alice', user_type='participant')
+        cls.bob = User.objects.create(username='bob', user_type='participant')
+        cls.carol = User.objects.create(username='carol', user_type='participant')
+
+    def send(self, sender, receiver, content='Hi'):
+        return Message.objects.create(sender=sender, receiver=receiver, content=content)
+
+    def state(self):
+        return sorted(Conversation.objects.values_list(
+            'user_low_id', 'user_high_id', 'last_message_id', 'last_message_snippet', 'unread_low', 'unread_high',
+        ))
+
+    def test_record_message_tracks_last_message_and_unread_counts(self):
+        self.send(self.alice, self.bob, 'First')
+        last = self.send(self.alice, self.bob, 'Second')
+        conversation = Conversation.objects.between(self.bob.id, self.alice.id).get()
+        self.assertEqual((conversation.last_message_id, conversation.last_message_snippet), (last.id, 'Second'))
+        self.assertEqual((conversation.unread_for(self.bob), conversation.unread_for(self.alice)), (2, 0))
+
+        reply = self.send(self.bob, self.alice, 'x' * 150)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_id, reply.id)
+        self.assertEqual(len(conversation.last_message_snippet), Conversation.SNIPPET_LENGTH)
+        self.assertEqual((conversation.unread_for(self.bob), conversation.unread_for(self.alice)), (2, 1))
+
+    def test_mark_read_never_goes_below_zero(self):
+        self.send(self.alice, self.bob)
+        Conversation.mark_read(self.bob.id, self.alice.id, 1)
+        Conversation.mark_read(self.bob.id, self.alice.id, 1)
+        self.assertEqual(Conversation.objects.between(self.alice.id, self.bob.id).get().unread_for(self.bob), 0)
+
+    def test_inbox_lists_conversations_newest_first(self):
+        self.send(self.alice, self.bob, 'Old')
+        self.send(self.carol, self.bob, 'New')
+        self.client.force_login(self.bob)
+        self.client.get(reverse('messaging_inbox'))
+        with self.assertNumQueries(5):  # session, user, conversations, registrations, cached unread badge
+            response = self.client.get(reverse('messaging_inbox'))
+        self.assertEqual(
+            [(user.username, user.last_message_snippet, user.unread_count) for user in response.context['conversations']],
+            [('carol', 'New', 1), ('alice', 'Old', 1)],
+        )
+
+    def test_backfill_rebuilds_the_table(self):
+        for sender, receiver in ((self.alice, self.bob), (self.bob, self.alice), (self.carol, self.alice)):
+            self.send(sender, receiver)
+        Message.objects.filter(sender=self.bob).update(is_read=True)
+        Conversation.mark_read(self.alice.id, self.bob.id, 1)
+        expected = self.state()
+
+        Conversation.objects.update(unread_low=7, last_message=None, last_message_snippet='')
+        Conversation.objects.filter(user_high=self.carol).delete()
+        dave = User.objects.create(username='dave', user_type='participant')
+        Conversation.objects.create(user_low=self.alice, user_high=dave, unread_low=3)
+        call_command('backfill_conversations', chunk_size=2, stdout=io.StringIO())
+        self.assertEqual(self.state(), expected)
+
+    def test_backfill_counts_messages_sent_during_the_run_once(self):
+        self.send(self.alice, self.bob)
+        bulk_create = Conversation.objects.bulk_create
+
+        def send_during_run(conversations, **kwargs):
+            # One to a pair in the running batch, one to a pair the scan has not reached
+            self.send(self.alice, self.bob)
+            self.send(self.carol, self.bob)
+            return bulk_create(conversations, **kwargs)
+
+        with mock.patch.object(Conversation.objects, 'bulk_create', side_effect=send_during_run):
+            call_command('backfill_conversations', chunk_size=1, stdout=io.StringIO())
+        self.assertEqual(Conversation.objects.unread_count(self.bob.id), 5)
+
+
+class ChatWindowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create(username='alice', user_type='participant')
+        cls.bob = User.objects.create(username='bob', user_type='participant')
+        cls.messages = [
+            Message.objects.create(
+                sender=cls.bob if i % 3 == 0 else cls.alice, receiver=cls.alice if i % 3 == 0 else cls.bob, content=str(i),
+            )
+            for i in range(2 * CHAT_WINDOW + 10)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.bob)
+
+    def older(self, before):
+        return self.client.get(reverse('older_messages', args=[self.alice.id]), {'before': before})
+
+    def unread_ids(self):
+        return set(Message.objects.filter(receiver=self.bob, is_read=False).values_list('id', flat=True))
+
+    def test_pages_walk_back_to_the_first_message(self):
+        response = self.client.get(reverse('conversation', args=[self.alice.id]))
+        ids = [message.id for message in response.context['conversation']]
+        self.assertEqual(len(ids), CHAT_WINDOW)
+        cursor = response.context['older_cursor']
+        while cursor:
+            page = self.older(cursor).json()
+            ids = [message['id'] for message in page['messages']] + ids
+            cursor = page['before']
+        self.assertEqual(ids, [message.id for message in self.messages])
+
+    def test_only_messages_shown_to_the_reader_are_marked_read(self):
+        from_alice = {message.id for message in self.messages if message.sender_id == self.alice.id}
+        latest = {message.id for message in self.messages[-CHAT_WINDOW:]}
+
+        response = self.client.get(reverse('conversation', args=[self.alice.id]))
+        self.assertEqual(self.unread_ids(), from_alice - latest)
+        self.assertEqual(Conversation.objects.unread_count(self.bob.id), len(from_alice - latest))
+        # Bob's own messages stay unread for Alice
+        self.assertEqual(Message.objects.filter(receiver=self.alice, is_read=True).count(), 0)
+
+        self.older(response.context['older_cursor'])
+        self.assertEqual(self.unread_ids(), from_alice - {message.id for message in self.messages[-2 * CHAT_WINDOW:]})
+
+    def test_cursor_is_validated(self):
+        latest = [message.id for message in self.messages[-CHAT_WINDOW:]]
+        for before in ('', None):
+            with self.subTest(before=before):
+                response = self.client.get(
+                    reverse('older_messages', args=[self.alice.id]), {} if before is None else {'before': before}
+                )
+                self.assertEqual([message['id'] for message in response.json()['messages']], latest)
+        for before in ('garbage', '2026-01-01T00:00:00+00:00~x', '2026-01-01T00:00:00~5'):
+            with self.subTest(before=before):
+                self.assertEqual(self.older(before).status_code, 400)
+
+
+class RealtimeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create(username='alice', user_type='participant')
+        cls.bob = User.objects.create(username='bob', user_type='participant')
+
+    async def test_broker_delivers_to_the_user_subscribed(self):
+        broker = InProcessBroker()
+        async with broker.subscribe(1) as first, broker.subscribe(1) as second, broker.subscribe(2) as other:
+            self.assertEqual(broker.connection_count(), 3)
+            broker.publish(1, {'type': 'message', 'id': 7})
+            self.assertEqual(await asyncio.wait_for(first.get(), 1), {'type': 'message', 'id': 7})
+            self.assertEqual(await asyncio.wait_for(second.get(), 1), {'type': 'message', 'id': 7})
+            self.assertTrue(other.empty())
+        self.assertEqual(broker.connection_count(), 0)
+        # Nobody listening is not an error
+        broker.publish(1, {'type': 'message', 'id': 8})
+
+    async def test_stream_sends_new_messages(self):
+        await self.async_client.aforce_login(self.bob)
+        response = await self.async_client.get(reverse('message_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        def send():
+            with self.captureOnCommitCallbacks(execute=True):
+                return Message.objects.create(sender=self.alice, receiver=self.bob, content='Hi Bob')
+
+        message = await sync_to_async(send)()
+        event = (await asyncio.wait_for(anext(stream), 5)).decode()
+        await response.streaming_content.aclose()
+        self.assertTrue(event.startswith('event: message\ndata: '))
+        data = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual((data['id'], data['sender_id'], data['content']), (message.id, self.alice.id, 'Hi Bob'))
+
+    def test_stream_is_refused_under_wsgi(self):
+        self.client.force_login(self.bob)
+        with mock.patch.object(InProcessBroker, 'subscribe') as subscribe:
+            response = self.client.get(reverse('message_stream'))
+        self.assertEqual(response.status_code, 204)
+        subscribe.assert_not_called()
+
+    def test_mark_messages_read_marks_and_publishes_a_receipt(self):
+        sent = [Message.objects.create(sender=self.alice, receiver=self.bob, content=str(i)) for i in range(3)]
+        own = Message.objects.create(sender=self.bob, receiver=self.alice, content='Mine')
+        self.client.force_login(self.bob)
+        with mock.patch('events.views.publish_read_receipt') as receipt, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('mark_messages_read', args=[self.alice.id]), {'ids': [sent[0].id, sent[1].id, own.id, 'x']},
+            )
+        self.assertEqual(response.json(), {'ok': True})
+        self.assertEqual(
+            list(Message.objects.filter(is_read=True).order_by('id').values_list('id', flat=True)), [sent[0].id, sent[1].id],
+        )
+        self.assertEqual(Conversation.objects.unread_count(self.bob.id), 1)
+        receipt.assert_called_once()
+        reader_id, sender_id, message_ids = receipt.call_args.args
+        self.assertEqual((reader_id, sender_id, sorted(message_ids)), (self.bob.id, self.alice.id, [sent[0].id, sent[1].id]))
+        self.assertEqual(self.client.get(reverse('mark_messages_read', args=[self.alice.id])).status_code, 405)
+
+
+class ReceiverSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = User.objects.create(username='sam', user_type='participant')
+        for username, first_name in (
+            ('andy', ''), ('Anton', ''), ('an\U0001d4b3', ''), ('zoe', 'Anna'), ('bob', 'Bob'), ('anselm', ''),
+        ):
+            User.objects.create(username=username, first_name=first_name, user_type='participant')
+        # Someone the sender already messages and the organizer of an event they registered for
+        Message.objects.create(sender=User.objects.get(username='anselm'), receiver=cls.sender, content='Hi')
+        organizer = User.objects.create(username='anya', user_type='organizer')
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Talk', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now, location='Hall A', max_participants=10, registration_link='https://example.com',
+        )
+        Registration.objects.create(event=event, user=cls.sender, name='Sam', email='sam@example.com')
+
+    def search(self, q):
+        self.client.force_login(self.sender)
+        return [user['username'] for user in self.client.get(reverse('user_search'), {'q': q}).json()['results']]
+
+    def test_known_people_first_then_usernames_then_names(self):
+        self.assertEqual(self.search(' AN'), ['anselm', 'anya', 'andy', 'Anton', 'an\U0001d4b3', 'zoe'])
+        self.assertEqual(self.search('bo'), ['bob'])
+        self.assertEqual(self.search('sa'), [])
+        self.assertEqual(self.search(''), [])
+
+    def test_results_are_limited(self):
+        User.objects.bulk_create([User(username=f'anonymous{i:02}', user_type='participant') for i in range(20)])
+        results = self.search('an')
+        self.assertEqual(len(results), RECEIVER_SEARCH_LIMIT)
+        self.assertEqual(results[:3], ['anselm', 'anya', 'andy'])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN checks are SQLite specific')
+class HotQueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on the hot lookups and fails if any of them falls back
+    to scanning a whole table or stops using the index added for it. Add new hot
+    queries to hot_queries() below.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='participant', user_type='participant')
+        cls.other = User.objects.create(username='organizer', user_type='organizer')
+
+    def hot_queries(self):
+        """name -> (queryset, index its plan must use)"""
+        user, other = self.user, self.other
+        return {
+            'unread_message_count': (
+                Conversation.objects.filter(Q(user_low=user) | Q(user_high=user)), 'conversation_low_time_idx',
+            ),
+            'chat_view conversation': (
+                Message.objects.filter(Q(sender=user, receiver=other) | Q(sender=other, receiver=user)).order_by('timestamp'),
+                'message_pair_time_idx',
+            ),
+            'profile_view registrations': (
+                Registration.objects.filter(user=user).order_by('-registered_at'), 'registration_user_time_idx',
+            ),
+            'organizer_dashboard events': (
+                Event.objects.filter(organizer=other).order_by('-created_at'), 'event_organizer_created_idx',
+            ),
+            'organizer_dashboard trend': (
+                EventDailyStats.objects.filter(event__organizer=other, day__gte=timezone.localdate())
+                .values('day').annotate(n=Sum('registrations')),
+                'event_organizer_created_idx',
+            ),
+            'upcoming events': (Event.objects.upcoming(), 'event_start_time_idx'),
+            'home active or recent events': (Event.objects.active_or_recent(), 'event_end_time_idx'),
+            'top rated past events': (Event.objects.top_rated(min_rating=4), 'event_rating_idx'),
+            'receiver typeahead': (
+                User.objects.annotate(username_lower=Lower('username')).filter(
+                    username_lower__gte='pa', username_lower__lt='pa' + PREFIX_RANGE_END
+                ).order_by('username_lower'),
+                'user_username_lower_idx',
+            ),
+            'registrations answer filter': (
+                RegistrationAnswer.objects.filter(event_id=1, field_id=1, value='MIT'), 'answer_facet_idx',
+            ),
+        }
+
+    def assertUsesIndex(self, name, queryset, index):
+        plan = queryset.explain()
+        # "SCAN <table>" ("SCAN TABLE <table>" before SQLite 3.36) walks every row;
+        # "SEARCH <table> USING INDEX" is what we want
+        scans = re.findall(r'SCAN (?:TABLE )?(events_\w+)', plan)
+        self.assertFalse(scans, f"{name} scans {', '.join(scans)}:\n{plan}")
+        self.assertIn(f'INDEX {index} ', plan, f"{name} doesn't use {index}:\n{plan}")
+
+    def test_hot_queries_use_indexes(self):
+        for name, (queryset, index) in self.hot_queries().items():
+            with self.subTest(name):
+                self.assertUsesIndex(name, queryset, index)
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create(username='organizer', user_type='organizer')
+        cls.participant = User.objects.create(username='participant', user_type='participant')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Workshop', description='Hands-on', organizer=cls.organizer,
+            category=Category.objects.create(name='Technical'), date=now + timedelta(days=1),
+            location='Hall A', max_participants=10, registration_link='https://example.com',
+            start_time=now + timedelta(days=1),
+        )
+
+    def test_registration_queues_confirmation_instead_of_sending(self):
+        self.client.force_login(self.participant)
+        self.client.post(reverse('register_for_event', args=[self.event.id]), {'name': 'P', 'email': 'p@example.com'})
+
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboxEmail.objects.get()
+        self.assertEqual(queued.to, ['p@example.com'])
+        self.assertEqual(queued.from_email, settings.DEFAULT_FROM_EMAIL)
+
+        self.assertEqual(deliver_batch(), (1, 0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Registration Confirmation for Workshop')
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboxEmail.SENT)
+
+    def test_failures_back_off_then_dead_letter(self):
+        email = enqueue_email('Subject', 'Body', ['p@example.com'])
+        with mock.patch('events.outbox.EmailMessage.send', side_effect=OSError('SMTP down')):
+            self.assertEqual(deliver_batch(max_attempts=2), (0, 1, 0))
+            email.refresh_from_db()
+            self.assertEqual(email.status, OutboxEmail.PENDING)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+            # Not due yet, so nothing is picked up
+            self.assertEqual(deliver_batch(max_attempts=2), (0, 0, 0))
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(deliver_batch(max_attempts=2), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.DEAD)
+        self.assertIn('SMTP down', email.last_error)
+
+
+class SeatReservationTests(TestCase):
+    def test_capacity_and_duplicates(self):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Talk', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Hall B', max_participants=2,
+            registration_link='https://example.com',
+        )
+        users = [User.objects.create(username=f'p{i}', user_type='participant') for i in range(3)]
+
+        def register(user):
+            return reserve_seat(Registration(event=event, user=user, name=user.username, email='p@example.com'))
+
+        self.assertEqual(register(users[0]), RESERVED)
+        self.assertEqual(register(users[0]), ALREADY_REGISTERED)
+        self.assertEqual(register(users[1]), RESERVED)
+        # A full event is rejected by the seat UPDATE alone
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(register(users[2]), FULL)
+        statements = [q['sql'] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('UPDATE "events_event"'))
+        # Repeat submits are still told apart from a full event
+        self.assertEqual(register(users[1]), ALREADY_REGISTERED)
+        event.refresh_from_db()
+        self.assertEqual(event.registered_count, 2)
+        self.assertEqual(event.registrations_real.count(), 2)
+
+
+class WaitlistTests(TestCase):
+    def test_positions_and_promotion_on_cancel(self):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Talk', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Hall B', max_participants=1,
+            registration_link='https://example.com',
+        )
+        users = [User.objects.create(username=f'p{i}', user_type='participant') for i in range(4)]
+        for user in users:
+            self.client.force_login(user)
+            self.client.post(reverse('register_for_event', args=[event.id]), {'name': user.username, 'email': 'p@example.com'})
+
+        def positions():
+            return [(e.user.username, waitlist_position(e)) for e in WaitlistEntry.objects.filter(event=event).order_by('ticket')]
+
+        self.assertEqual(positions(), [('p1', 1), ('p2', 2), ('p3', 3)])
+
+        # Leaving from the middle moves everyone behind up
+        self.client.force_login(users[2])
+        self.client.post(reverse('cancel_registration', args=[event.id]))
+        self.assertEqual(positions(), [('p1', 1), ('p3', 2)])
+
+        # Cancelling a registration hands the seat to the head of the queue
+        self.client.force_login(users[0])
+        self.client.post(reverse('cancel_registration', args=[event.id]))
+        self.assertEqual(positions(), [('p3', 1)])
+        self.assertEqual(list(event.registrations_real.values_list('user__username', flat=True)), ['p1'])
+        event.refresh_from_db()
+        self.assertEqual(event.registered_count, 1)
+        self.assertEqual(OutboxEmail.objects.filter(subject='You have a seat at Talk').count(), 1)
+
+        # New arrivals queue behind the existing entries
+        self.client.force_login(users[2])
+        self.client.post(reverse('register_for_event', args=[event.id]), {'name': 'p2', 'email': 'p@example.com'})
+        self.assertEqual(positions(), [('p3', 1), ('p2', 2)])
+
+    def test_seats_freed_or_added_elsewhere_go_to_the_waitlist_first(self):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Talk', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Hall B', max_participants=1,
+            registration_link='https://example.com',
+        )
+        users = [User.objects.create(username=f'p{i}', user_type='participant') for i in range(5)]
+
+        def register(user):
+            registration = Registration(event=event, user=user, name=user.username, email='p@example.com')
+            outcome = reserve_seat(registration)
+            if outcome == FULL:
+                join_waitlist(registration)
+            return outcome
+
+        def registered():
+            return sorted(event.registrations_real.values_list('user__username', flat=True))
+
+        self.assertEqual([register(user) for user in users[:3]], [RESERVED, FULL, FULL])
+
+        # Raising the capacity promotes, and a newcomer can't take a seat owed to the queue
+        event.max_participants = 2
+        event.save()
+        self.assertEqual(registered(), ['p0', 'p1'])
+        Event.objects.filter(pk=event.pk).update(max_participants=3)
+        self.assertEqual(register(users[3]), FULL)
+        self.assertEqual(registered(), ['p0', 'p1'])
+
+        # A delete outside cancel_registration (admin, delete_duplicates) promotes too
+        Registration.objects.filter(event=event, user=users[0]).delete()
+        self.assertEqual(registered(), ['p1', 'p2', 'p3'])
+        event.refresh_from_db()
+        self.assertEqual(event.registered_count, 3)
+        self.assertFalse(WaitlistEntry.objects.filter(event=event).exists())
+
+        # With nobody waiting, a free seat is open to newcomers again
+        Registration.objects.filter(event=event, user=users[1]).delete()
+        self.assertEqual(register(users[4]), RESERVED)
+
+
+class RegistrationUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        cls.participant = User.objects.create(username='participant', user_type='participant')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Hackathon', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Lab', max_participants=10,
+            registration_link='https://example.com',
+        )
+        CustomField.objects.create(event=cls.event, label='ID Card', field_type='file', required=True, max_file_size=1024)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client.force_login(self.participant)
+
+    def register(self, upload):
+        return self.client.post(
+            reverse('register_for_event', args=[self.event.id]),
+            {'name': 'P', 'email': 'p@example.com', 'ID Card': upload},
+        )
+
+    def test_file_is_stored_under_its_content_hash(self):
+        content = b'%PDF-1.4 id card'
+        self.register(SimpleUploadedFile('card.PDF', content, content_type='application/pdf'))
+
+        registration = Registration.objects.get()
+        answer = registration.responses['ID Card']
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(answer['path'], f'registration_files/{self.event.id}/{digest[:2]}/{digest}.pdf')
+        self.assertEqual((answer['name'], answer['size'], answer['sha256']), ('card.PDF', len(content), digest))
+        self.assertEqual(registration.uploaded_file.name, answer['path'])
+        with registration.uploaded_file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+
+    def test_limits_are_enforced(self):
+        cases = {
+            'too large': SimpleUploadedFile('card.pdf', b'%PDF-' + b'x' * 2048, content_type='application/pdf'),
+            'wrong type': SimpleUploadedFile('card.txt', b'hello', content_type='text/plain'),
+            'disguised': SimpleUploadedFile('card.pdf', b'MZ\x90\x00', content_type='application/pdf'),
+        }
+        for case, upload in cases.items():
+            with self.subTest(case):
+                response = self.register(upload)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['form'].errors['ID Card'])
+        self.assertFalse(Registration.objects.exists())
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), settings.MEDIA_ROOT)
+            for root, dirs, files in os.walk(settings.MEDIA_ROOT) for name in files
+        )
+
+    def test_files_are_only_stored_for_a_registration_that_is_kept(self):
+        with mock.patch('events.views.enqueue_email', side_effect=RuntimeError('outbox down')):
+            with self.assertRaises(RuntimeError):
+                self.register(SimpleUploadedFile('card.pdf', b'%PDF-1.4 first', content_type='application/pdf'))
+        self.assertEqual(self.stored_files(), [])
+
+        self.register(SimpleUploadedFile('card.pdf', b'%PDF-1.4 second', content_type='application/pdf'))
+        stored = self.stored_files()
+        self.assertEqual(stored, [Registration.objects.get().responses['ID Card']['path']])
+
+        # A repeat submit is ALREADY_REGISTERED: its file is not kept
+        self.register(SimpleUploadedFile('card.pdf', b'%PDF-1.4 third', content_type='application/pdf'))
+        self.assertEqual(self.stored_files(), stored)
+
+    def test_waitlisted_registrations_keep_their_files(self):
+        Event.objects.filter(pk=self.event.pk).update(max_participants=0)
+        self.register(SimpleUploadedFile('card.pdf', b'%PDF-1.4 queued', content_type='application/pdf'))
+        self.assertEqual(self.stored_files(), [WaitlistEntry.objects.get().responses['ID Card']['path']])
+
+
+class RegistrationExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Meetup', description='', organizer=cls.organizer, category=Category.objects.create(name='Social'),
+            date=now, start_time=now + timedelta(days=1), location='Cafe', max_participants=10,
+            registration_link='https://example.com',
+        )
+        for label, field_type in [('Year of Study', 'number'), ('ID Card', 'file'), ('College Name', 'text')]:
+            CustomField.objects.create(event=cls.event, label=label, field_type=field_type)
+        participant = User.objects.create(username='participant', user_type='participant')
+        Registration.objects.create(
+            event=cls.event, user=participant, name='Ada', email='ada@example.com',
+            responses={'College Name': '=HYPERLINK("x")', 'Year of Study': 2,
+                       'ID Card': {'name': 'id.pdf', 'path': 'registration_files/1/ab/ab.pdf'}},
+        )
+
+    def export(self, export_format):
+        self.client.force_login(self.organizer)
+        response = self.client.get(
+            reverse('export_registrations', args=[self.event.id]), {'format': export_format}
+        )
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_has_a_column_per_custom_field(self):
+        rows = list(csv.reader(io.StringIO(self.export('csv').decode('utf-8-sig'))))
+        self.assertEqual(rows[0][4:], ['Year of Study', 'ID Card', 'College Name'])
+        self.assertEqual(rows[1][4:], ['2', 'registration_files/1/ab/ab.pdf', "'=HYPERLINK(\"x\")"])
+
+    def test_xlsx_is_a_valid_workbook(self):
+        workbook = zipfile.ZipFile(io.BytesIO(self.export('xlsx')))
+        self.assertIsNone(workbook.testzip())
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 2)
+        self.assertIn('registration_files/1/ab/ab.pdf', sheet)
+
+
+class BulkCheckInTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Conference', description='', organizer=cls.organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now, location='Hall C', max_participants=10, registration_link='https://example.com',
+        )
+        cls.registrations = [
+            Registration.objects.create(
+                event=cls.event, user=User.objects.create(username=f'p{i}', user_type='participant'),
+                name=f'P{i}', email=f'P{i}@example.com', attended=(i == 0),
+            )
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.organizer)
+
+    def attended(self):
+        return sorted(Registration.objects.filter(attended=True).values_list('name', flat=True))
+
+    def test_csv_matches_email_or_username(self):
+        sheet = SimpleUploadedFile('attendees.csv', b'Name,Email\nA,p0@example.com\nB,P1@EXAMPLE.COM\nC,p2\nD,nobody@example.com\n')
+        self.client.post(reverse('bulk_check_in', args=[self.event.id]), {'attendees': sheet})
+
+        self.assertEqual(self.attended(), ['P0', 'P1', 'P2'])
+        # Feedback eligibility follows the check-in
+        self.assertEqual(EventRegistration.objects.filter(event=self.event, attended=True).count(), 3)
+
+    def test_ids_endpoint_returns_summary(self):
+        ids = [r.id for r in self.registrations[:2]] + [999999]
+        response = self.client.post(
+            reverse('mark_attendance', args=[self.event.id]), {'registration_ids': ids}, content_type='application/json'
+        )
+        self.assertEqual(
+            response.json(),
+            {'matched': 1, 'already_attended': 1, 'unmatched': 1, 'unmatched_sample': [999999]},
+        )
+        self.assertEqual(self.attended(), ['P0', 'P1'])
+
+
+class DoorCheckInTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Gala', description='', organizer=cls.organizer, category=Category.objects.create(name='Social'),
+            date=now, start_time=now, location='Ballroom', max_participants=10, registration_link='https://example.com',
+        )
+        cls.participant = User.objects.create(username='participant', user_type='participant')
+
+    def scan(self, token):
+        self.client.force_login(self.organizer)
+        return self.client.post(
+            reverse('checkin_scanner', args=[self.event.id]), {'token': token}, content_type='application/json'
+        ).json()
+
+    def test_confirmation_carries_a_scannable_token(self):
+        self.client.force_login(self.participant)
+        self.client.post(reverse('register_for_event', args=[self.event.id]), {'name': 'Ada', 'email': 'ada@example.com'})
+        registration = Registration.objects.get()
+        [attachment] = OutboxEmail.objects.get().attachments
+        self.assertEqual((attachment['filename'], attachment['mimetype']), ('check-in.png', 'image/png'))
+
+        token = make_checkin_token(registration)
+        self.assertRegex(token, r'^[0-9A-Z.]+$')  # QR alphanumeric mode
+        self.assertEqual(read_checkin_token(token.lower()), (self.event.id, registration.id))
+
+        self.assertEqual(self.scan(token), {'status': CHECKED_IN, 'name': 'Ada'})
+        self.assertEqual(self.scan(token), {'status': ALREADY_CHECKED_IN, 'name': 'Ada'})
+        self.assertTrue(EventRegistration.objects.get(participant=self.participant).attended)
+
+    def test_bad_tokens_are_rejected_without_queries(self):
+        registration = Registration.objects.create(event=self.event, user=self.participant, name='Ada', email='a@example.com')
+        token = make_checkin_token(registration)
+        with self.assertNumQueries(0):
+            self.assertEqual(scan_token(token[:-1] + ('A' if token[-1] != 'A' else 'B'), self.event.id, self.organizer.id)[0], INVALID)
+            self.assertEqual(scan_token(token, self.event.id + 1, self.organizer.id)[0], INVALID)
+            self.assertEqual(scan_token('garbage', self.event.id, self.organizer.id)[0], INVALID)
+        # Another organizer's scanner can't check people in here
+        self.assertEqual(scan_token(token, self.event.id, self.participant.id)[0], NOT_FOUND)
+
+
+class RegistrationFormCacheTests(TestCase):
+    def test_form_is_built_once_per_schema_version(self):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Bootcamp', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Lab', max_participants=10,
+            registration_link='https://example.com',
+        )
+        CustomField.objects.create(event=event, label='College Name', field_type='text', required=True)
+        url = reverse('register_for_event', args=[event.id])
+        self.client.force_login(User.objects.create(username='participant', user_type='participant'))
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {'name': 'P', 'email': 'p@example.com', 'College Name': 'MIT'})
+        self.assertFalse([q['sql'] for q in queries if 'events_customfield' in q['sql']])
+        self.assertEqual(Registration.objects.get().responses, {'College Name': 'MIT'})
+
+        # Editing the fields bumps the version, so the next request builds a new form
+        CustomField.objects.create(event=event, label='Department', field_type='text', required=True)
+        response = self.client.get(url)
+        self.assertIn('Department', response.context['form'].fields)
+
+    def test_field_saves_and_deletes_bump_the_schema_version(self):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Bootcamp', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Lab', max_participants=10,
+            registration_link='https://example.com',
+        )
+
+        def version():
+            return Event.objects.values_list('schema_version', flat=True).get(pk=event.pk)
+
+        field = CustomField.objects.create(event=event, label='College Name', field_type='text')
+        self.assertEqual(version(), 1)
+        field.required = True
+        field.save()
+        self.assertEqual(version(), 2)
+        loaded = CustomField(pk=1000, event=event, label='Team', field_type='text')
+        for obj in serializers.deserialize('json', serializers.serialize('json', [loaded])):
+            obj.save()
+        self.assertEqual(version(), 2)
+        field.delete()
+        self.assertEqual(version(), 3)
+
+
+class CustomFieldEditingTests(TestCase):
+    def test_edits_keep_field_ids_and_answers(self):
+        organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        event = Event.objects.create(
+            title='Summit', description='', organizer=organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Hall D', max_participants=10,
+            registration_link='https://example.com',
+        )
+        college = CustomField.objects.create(event=event, label='College Name', field_type='text', required=True)
+        team = CustomField.objects.create(event=event, label='Team', field_type='text')
+        shirt = CustomField.objects.create(event=event, label='Shirt', field_type='text')
+        registration = Registration.objects.create(
+            event=event, user=User.objects.create(username='participant', user_type='participant'),
+            name='Ada', email='ada@example.com', responses={'College Name': 'MIT', 'Team': 'Blue', 'Shirt': 'M'},
+        )
+        event.refresh_from_db()
+        version = event.schema_version
+
+        post = QueryDict(mutable=True)
+        post['College Name'] = 'on'  # built-in checkbox, matched by label
+        post.setlist('custom_id[]', [str(team.id), ''])
+        post.setlist('custom_label[]', ['Squad', 'Diet'])
+        post.setlist('custom_type[]', ['text', 'text'])
+        post.setlist('custom_required[]', ['on', ''])
+
+        # One read, one write per kind of change (the delete also cascades to its
+        # indexed answers), the answer rewrite and the version bump
+        with self.assertNumQueries(12):
+            changes = apply_field_changes(event, fields_from_post(post))
+        self.assertEqual(changes, {'created': 1, 'updated': 1, 'deleted': 1})
+
+        fields = {f.label: f for f in event.custom_fields.all()}
+        self.assertEqual(set(fields), {'College Name', 'Squad', 'Diet'})
+        self.assertEqual((fields['College Name'].id, fields['Squad'].id), (college.id, team.id))
+        self.assertTrue(fields['Squad'].required)
+        self.assertFalse(CustomField.objects.filter(id=shirt.id).exists())
+
+        registration.refresh_from_db()
+        self.assertEqual(registration.responses, {'College Name': 'MIT', 'Squad': 'Blue', 'Shirt': 'M'})
+        event.refresh_from_db()
+        self.assertEqual(event.schema_version, version + 1)
+
+
+class RegistrationAnswerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Summit', description='', organizer=cls.organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Hall D', max_participants=10,
+            registration_link='https://example.com',
+        )
+        cls.college = CustomField.objects.create(event=cls.event, label='College Name', field_type='text', required=True)
+        cls.team = CustomField.objects.create(event=cls.event, label='Team', field_type='text')
+
+    def register(self, username, college, team):
+        self.client.force_login(User.objects.create(username=username, user_type='participant'))
+        self.client.post(reverse('register_for_event', args=[self.event.id]), {
+            'name': username, 'email': f'{username}@example.com', 'College Name': college, 'Team': team,
+        })
+
+    def test_answers_are_indexed_filtered_and_counted(self):
+        self.register('ada', 'MIT', 'Blue')
+        self.register('bob', 'MIT', 'Red')
+        self.register('cy', 'CMU', 'Blue')
+        self.assertEqual(RegistrationAnswer.objects.filter(event=self.event).count(), 6)
+
+        self.assertEqual(facet_counts(self.event), {
+            self.college.id: [('MIT', 2), ('CMU', 1)],
+            self.team.id: [('Blue', 2), ('Red', 1)],
+        })
+
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse('event_registrations', args=[self.event.id]), {
+            'answer': [f'{self.college.id}:MIT', f'{self.team.id}:Blue'],
+        })
+        self.assertEqual([r.name for r in response.context['registrations']], ['ada'])
+        facets = dict(response.context['facets'])
+        self.assertEqual([(v['value'], v['count']) for v in facets['Team']], [('Blue', 1)])
+        self.assertEqual(len(response.context['active_filters']), 2)
+
+    def test_backfill_indexes_existing_registrations_once(self):
+        Registration.objects.create(
+            event=self.event, user=User.objects.create(username='ada', user_type='participant'),
+            name='Ada', email='ada@example.com', responses={'College Name': 'MIT', 'Team': ' ', 'Removed': 'x'},
+        )
+        call_command('backfill_registration_answers', stdout=io.StringIO())
+        call_command('backfill_registration_answers', stdout=io.StringIO())
+        self.assertEqual(
+            list(RegistrationAnswer.objects.values_list('field_id', 'value')), [(self.college.id, 'MIT')]
+        )
+
+
+class RegistrantReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create(username='organizer', user_type='organizer')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Summit', description='', organizer=cls.organizer, category=Category.objects.create(name='Technical'),
+            date=now, start_time=now + timedelta(days=1), location='Hall D', max_participants=10,
+            registration_link='https://example.com',
+        )
+        cls.year = CustomField.objects.create(event=cls.event, label='Year of Study', field_type='number')
+        answers = [('1', True), ('2', False), ('1', False), (None, True)]
+        for i, (year, attended) in enumerate(answers):
+            registration = Registration.objects.create(
+                event=cls.event, user=User.objects.create(username=f'p{i}', user_type='participant'),
+                name=f'P{i}', email=f'p{i}@example.com', attended=attended,
+                responses={'Year of Study': year} if year else {},
+            )
+            record_answers(registration)
+        # Two registrations on the first day, two on the third
+        Registration.objects.filter(name__in=['P0', 'P1']).update(registered_at=now - timedelta(days=2))
+
+    def test_cross_tab_rates_and_fill_curve(self):
+        report = RegistrantReport(self.event)
+        self.assertEqual(len(report), 4)
+        self.assertEqual(report.cross_tab(self.year.id, ATTENDED), {
+            'rows': ['1', '2', '(no answer)'],
+            'columns': ['Not attended', 'Attended'],
+            'counts': [[1, 1], [1, 0], [0, 1]],
+            'row_totals': [2, 1, 1],
+            'column_totals': [2, 2],
+        })
+        self.assertEqual(report.attendance_rates(self.year.id)['rates'], [0.5, 0.0, 1.0])
+
+        curve = report.fill_curve()
+        self.assertEqual(len(curve['days']), 3)
+        self.assertEqual(curve['registered'], [2, 2, 4])
+        self.assertEqual(curve['fill'], [0.2, 0.2, 0.4])
+        self.assertEqual(report.histogram(DAY)['counts'], [2, 0, 2])
+
+    def test_row_reads_match_packed_reads(self):
+        def breakdown():
+            report = RegistrantReport(self.event)
+            return report.cross_tab(self.year.id, DAY), report.fill_curve(), report.registered_at.tolist()
+
+        packed = breakdown()
+        with mock.patch('events.reports.PACKED_VENDORS', ()):
+            self.assertEqual(breakdown(), packed)
+
+    def test_report_json(self):
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse('event_report', args=[self.event.id]), {
+            'rows': self.year.id, 'columns': 'attended', 'format': 'json',
+        })
+        data = response.json()
+        self.assertEqual((data['registrations'], data['attended']), (4, 2))
+        self.assertEqual(data['cross_tab']['row_totals'], [2, 1, 1])
+
+        response = self.client.get(reverse('event_report', args=[self.event.id]))
+        self.assertContains(response, 'Fill Curve')
+
+
+class OrganizerDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create(username='organizer', user_type='organizer')
+        cls.category = Category.objects.create(name='Technical')
+
+    def add_event(self, days_from_now):
+        now = timezone.now()
+        return Event.objects.create(
+            title='Meetup', description='', organizer=self.organizer, category=self.category,
+            date=now, start_time=now + timedelta(days=days_from_now), location='Hall E', max_participants=10,
+            registration_link='https://example.com',
+        )
+
+    def test_query_count_does_not_grow_with_events(self):
+        self.client.force_login(self.organizer)
+        self.add_event(1)
+        self.client.get(reverse('organizer_dashboard'))  # first request also saves the session
+        with CaptureQueriesContext(connection) as one_event:
+            self.client.get(reverse('organizer_dashboard'))
+        for days in (2, 3, -2, -3):
+            self.add_event(days)
+        with self.assertNumQueries(len(one_event)):
+            response = self.client.get(reverse('organizer_dashboard'))
+
+        self.assertEqual(response.context['events_count'], 5)
+        self.assertEqual(response.context['upcoming_events_count'], 3)
+        self.assertEqual(response.context['completed_events_count'], 2)
+
+    def test_deleting_an_event_or_its_organizer_logs_no_cancellations(self):
+        participant = User.objects.create(username='participant', user_type='participant')
+        events = [self.add_event(1), self.add_event(2)]
+        for event in events:
+            for i in range(3):
+                user = participant if i == 0 else User.objects.create(username=f'p{event.pk}-{i}', user_type='participant')
+                Registration.objects.create(event=event, user=user, name=user.username, email='p@example.com')
+        RegistrationActivity.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            events[0].delete()
+        self.assertFalse(RegistrationActivity.objects.exists())
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith('UPDATE "events_event"')])
+
+        self.organizer.delete()
+        self.assertFalse(RegistrationActivity.objects.exists())
+
+        # A participant's own registrations elsewhere are still cancelled
+        other = Event.objects.create(
+            title='Other', description='', organizer=User.objects.create(username='other', user_type='organizer'),
+            category=self.category, date=timezone.now(), start_time=timezone.now(), location='Hall E',
+            max_participants=10, registration_link='https://example.com',
+        )
+        Registration.objects.create(event=other, user=participant, name='P', email='p@example.com')
+        participant.delete()
+        self.assertEqual(
+            list(RegistrationActivity.objects.order_by('id').values_list('event_id', 'kind')),
+            [(other.pk, RegistrationActivity.REGISTERED), (other.pk, RegistrationActivity.CANCELLED)],
+        )
+        other.refresh_from_db()
+        self.assertEqual(other.registered_count, 0)
+
+    def test_activity_rolls_up_per_day(self):
+        event = self.add_event(1)
+        participants = [User.objects.create(username=f'p{i}', user_type='participant') for i in range(3)]
+        registrations = [
+            Registration.objects.create(event=event, user=user, name=user.username, email='p@example.com')
+            for user in participants
+        ]
+        registrations[0].delete()
+        check_in_by_ids(event, [registrations[1].id])
+
+        self.assertEqual(fold_batch(batch_size=2), 2)
+        self.assertEqual(fold_batch(), 3)
+        self.assertEqual(fold_batch(), 0)
+        stats = EventDailyStats.objects.get(event=event)
+        self.assertEqual((stats.registrations, stats.cancellations, stats.attendances), (3, 1, 1))
+
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse('organizer_dashboard'))
+        self.assertEqual(response.context['total_registrations'], 2)
+        self.assertEqual(response.context['trend'][-1]['registrations'], 3)
+        self.assertEqual(response.context['trend_totals']['cancellations'], 1)
+
+
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create(username='organizer', user_type='organizer')
+        cls.category = Category.objects.create(name='Technical')
+
+    def add_event(self, title, days_from_now=-2):
+        now = timezone.now()
+        return Event.objects.create(
+            title=title, description='', organizer=self.organizer, category=self.category,
+            date=now, start_time=now + timedelta(days=days_from_now), location='Hall F', max_participants=10,
+            registration_link='https://example.com',
+        )
+
+    def rate(self, event, *ratings):
+        for rating in ratings:
+            participant = User.objects.create(username=f'p{User.objects.count()}', user_type='participant')
+            EventFeedback.objects.create(event=event, participant=participant, rating=rating, comment='')
+
+    def test_aggregates_follow_create_edit_and_delete(self):
+        event = self.add_event('Workshop')
+        participant = User.objects.create(username='attendee', user_type='participant')
+        EventRegistration.objects.create(event=event, participant=participant, attended=True)
+        self.client.force_login(participant)
+        self.client.post(reverse('add_feedback', args=[event.id]), {'rating': 5, 'comment': 'Great'})
+        self.rate(event, 2, 5)
+
+        event.refresh_from_db()
+        self.assertEqual((event.rating_count, event.rating_sum, event.rating_average), (3, 12, 4.0))
+        self.assertEqual([count for stars, count, percent in event.rating_histogram], [2, 0, 0, 1, 0])
+
+        feedback = EventFeedback.objects.get(event=event, rating=2)
+        feedback.rating = 3
+        feedback.save()
+        EventFeedback.objects.get(event=event, participant=participant).delete()
+        event.refresh_from_db()
+        self.assertEqual((event.rating_count, event.rating_average, event.rating_2, event.rating_3), (2, 4.0, 0, 1))
+
+        EventFeedback.objects.filter(event=event).delete()
+        event.refresh_from_db()
+        self.assertEqual((event.rating_count, event.rating_sum, event.rating_average), (0, 0, None))
+
+    def test_top_rated_past_events(self):
+        good, better, upcoming = self.add_event('Good'), self.add_event('Better'), self.add_event('Soon', 2)
+        self.add_event('Unrated')
+        self.rate(good, 4, 3)
+        self.rate(better, 5)
+        self.rate(upcoming, 5)
+
+        self.assertEqual([e.title for e in Event.objects.top_rated()], ['Better', 'Good'])
+        self.assertEqual([e.title for e in Event.objects.top_rated(min_rating=4)], ['Better'])
+
+        self.client.force_login(self.organizer)
+        response = self.client.get(reverse('event_list'), {'sort': 'top_rated'})
+        self.assertEqual([e.title for e in response.context['events']], ['Better', 'Good'])
+
+
+@override_settings(FEEDBACK_SUMMARY_BACKEND='events.summaries.StubBackend')
+class FeedbackSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.participant = User.objects.create(username='participant', user_type='participant')
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Workshop', description='', organizer=User.objects.create(username='organizer', user_type='organizer'),
+            category=Category.objects.create(name='Technical'), date=now, start_time=now - timedelta(days=1),
+            location='Hall G', max_participants=10, registration_link='https://example.com',
+        )
+
+    def detail(self):
+        self.client.force_login(self.participant)
+        return self.client.get(reverse('event_detail', args=[self.event.id])).context
+
+    def test_page_serves_last_good_summary_while_worker_catches_up(self):
+        EventFeedback.objects.create(event=self.event, participant=self.participant, rating=4, comment='Useful')
+        with mock.patch.object(StubBackend, 'summarize') as summarize:
+            context = self.detail()
+        summarize.assert_not_called()
+        self.assertEqual((context['ai_summary'], context['ai_summary_pending']), ('', True))
+
+        self.assertEqual(generate_batch(), (1, 0, 0, 0))
+        self.assertEqual(generate_batch(), (0, 0, 0, 0))
+        context = self.detail()
+        self.assertEqual((context['ai_summary'], context['ai_summary_pending']), ('1 reviews of Workshop, average 4.0.', False))
+
+        # Nothing changed: the hash matches, so the backend is not called again
+        request_summary(self.event.id)
+        self.assertEqual(generate_batch(), (0, 1, 0, 0))
+
+        # A failure keeps the old text and retries later
+        other = User.objects.create(username='other', user_type='participant')
+        EventFeedback.objects.create(event=self.event, participant=other, rating=2, comment='Too long')
+        with mock.patch.object(StubBackend, 'summarize', side_effect=OSError('timeout')):
+            self.assertEqual(generate_batch(), (0, 0, 1, 0))
+        summary = FeedbackSummary.objects.get(event=self.event)
+        self.assertEqual(summary.text, '1 reviews of Workshop, average 4.0.')
+        self.assertGreater(summary.requested_at, timezone.now())
+        self.assertEqual(self.detail()['ai_summary_pending'], True)
+
+    def test_failing_event_is_dead_lettered_after_max_attempts(self):
+        EventFeedback.objects.create(event=self.event, participant=self.participant, rating=4, comment='Useful')
+        with mock.patch.object(StubBackend, 'summarize', side_effect=OSError('timeout')) as summarize:
+            self.assertEqual(generate_batch(max_attempts=2), (0, 0, 1, 0))
+            FeedbackSummary.objects.update(requested_at=timezone.now())
+            self.assertEqual(generate_batch(max_attempts=2), (0, 0, 0, 1))
+            self.assertEqual(generate_batch(max_attempts=2), (0, 0, 0, 0))
+        self.assertEqual(summarize.call_count, 2)
+        summary = FeedbackSummary.objects.get(event=self.event)
+        self.assertEqual((summary.requested_at, summary.attempts, summary.last_error), (None, 2, 'OSError: timeout'))
+        self.assertEqual(self.detail()['ai_summary_pending'], False)
+
+        # New feedback asks again, with a fresh attempt budget
+        other = User.objects.create(username='other', user_type='participant')
+        EventFeedback.objects.create(event=self.event, participant=other, rating=2, comment='Too long')
+        self.assertEqual(FeedbackSummary.objects.get(event=self.event).attempts, 0)
+        self.assertEqual(generate_batch(), (1, 0, 0, 0))
+
+    def test_page_render_does_not_write_and_migration_backfills_rows(self):
+        EventFeedback.objects.create(event=self.event, participant=self.participant, rating=4, comment='Useful')
+        FeedbackSummary.objects.all().delete()
+        self.client.force_login(self.participant)
+        with CaptureQueriesContext(connection) as queries:
+            context = self.client.get(reverse('event_detail', args=[self.event.id])).context
+        self.assertEqual((context['ai_summary'], context['ai_summary_pending']), ('', False))
+        self.assertFalse([q for q in queries if 'events_feedbacksummary' in q['sql'] and not q['sql'].startswith('SELECT')])
+        self.assertFalse(FeedbackSummary.objects.exists())
+
+        migration = importlib.import_module('events.migrations.0049_backfill_feedback_summaries')
+        migration.request_missing_summaries(apps, None)
+        migration.request_missing_summaries(apps, None)
+        self.assertEqual(list(FeedbackSummary.objects.values_list('event_id', flat=True)), [self.event.id])
+        self.assertEqual(generate_batch(), (1, 0, 0, 0))
+
+    def test_extractive_backend_picks_recurring_sentences(self):
+        feedback = [
+            EventFeedback(rating=5, comment='The speakers were great. Lunch was cold.'),
+            EventFeedback(rating=3, comment='Great speakers, but the room was small.'),
+        ]
+        self.assertEqual(
+            ExtractiveBackend().summarize(self.event, feedback),
+            'Rated 4.0/5 by 2 participants. Participants said: "The speakers were great." '
+            '"Great speakers, but the room was small."',
+        )
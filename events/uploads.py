@@ -0,0 +1,130 @@
+"""
+Streaming uploads for custom-field file answers.
+
+register_for_event installs RegistrationUploadHandler before the request body
+is parsed. Each file goes to a temporary file one chunk at a time, so memory
+per upload stays at one chunk whatever the file size, and its SHA-256 is
+computed as the chunks pass through. Size and type limits are checked as the
+body arrives: a file that breaks them is skipped on the spot and the rest of
+it is never stored. upload_answer() gives each file a content-addressed path,
+which is what gets recorded in Registration.responses, and store_upload()
+moves it there once the registration or waitlist entry that refers to it
+exists, so a rejected or duplicate submit leaves nothing behind in storage.
+"""
+import hashlib
+import os
+from fnmatch import fnmatch
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.template.defaultfilters import filesizeformat
+
+UPLOAD_DIR = 'registration_files'
+
+# Leading bytes of the types we accept by default, so a renamed file can't pass as one of them
+SIGNATURES = {
+    'application/pdf': (b'%PDF-',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/gif': (b'GIF87a', b'GIF89a'),
+}
+
+
+def upload_limits(field):
+    """(max bytes, allowed MIME patterns) for a 'file' CustomField."""
+    types = [t.strip() for t in field.allowed_file_types.split(',') if t.strip()]
+    return (
+        field.max_file_size or settings.REGISTRATION_UPLOAD_MAX_SIZE,
+        types or settings.REGISTRATION_UPLOAD_TYPES,
+    )
+
+
+def describe_limits(field):
+    max_size, types = upload_limits(field)
+    return f"{', '.join(types)}; up to {filesizeformat(max_size)}"
+
+
+class RegistrationUploadHandler(FileUploadHandler):
+    """
+    Upload handler for the file questions of one event. Files for any other
+    field are dropped; rejected files are reported in `errors` by field name.
+    """
+
+    def __init__(self, custom_fields, request=None):
+        super().__init__(request)
+        self.limits = {f.label: upload_limits(f) for f in custom_fields if f.field_type == 'file'}
+        self.errors = {}
+        self.temp_file = None
+
+    def reject(self, message):
+        self.errors[self.field_name] = message
+        self.discard()
+        raise SkipFile()
+
+    def discard(self):
+        if self.temp_file is not None:
+            self.temp_file.close()  # also removes the temporary file
+            self.temp_file = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name not in self.limits:
+            raise SkipFile()
+        self.max_size, allowed = self.limits[field_name]
+        if not any(fnmatch(content_type, pattern) for pattern in allowed):
+            self.reject(f"{content_type or 'This file type'} is not accepted here ({', '.join(allowed)}).")
+        if content_length and content_length > self.max_size:
+            self.reject(f'File is larger than {filesizeformat(self.max_size)}.')
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.temp_file = TemporaryUploadedFile(file_name, content_type, 0, charset, content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0 and self.content_type in SIGNATURES and not raw_data.startswith(SIGNATURES[self.content_type]):
+            self.reject(f"File content doesn't match its type ({self.content_type}).")
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.reject(f'File is larger than {filesizeformat(self.max_size)}.')
+        self.sha256.update(raw_data)
+        self.temp_file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.temp_file is None:
+            return None
+        uploaded, self.temp_file = self.temp_file, None
+        uploaded.seek(0)
+        uploaded.size = file_size
+        uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
+
+    def upload_interrupted(self):
+        self.discard()
+
+
+def upload_answer(uploaded, event_id):
+    """
+    The answer to record in responses for a file received by
+    RegistrationUploadHandler. Paths are content-addressed per event, so the
+    same file uploaded twice is stored once and the path never changes.
+    """
+    extension = os.path.splitext(uploaded.name)[1].lower()[:10]
+    return {
+        'name': uploaded.name,
+        'path': f'{UPLOAD_DIR}/{event_id}/{uploaded.sha256[:2]}/{uploaded.sha256}{extension}',
+        'size': uploaded.size,
+        'content_type': uploaded.content_type,
+        'sha256': uploaded.sha256,
+    }
+
+
+def store_upload(uploaded, answer):
+    """Persist `uploaded` at its answer's path, unless a file with the same content is already there."""
+    path = answer['path']
+    if not default_storage.exists(path):
+        # FileSystemStorage moves the temporary file into place rather than copying it
+        saved = default_storage.save(path, uploaded)
+        if saved != path:
+            # The same content was stored under `path` meanwhile; keep that copy
+            default_storage.delete(saved)
@@ -48,11 +48,20 @@ urlpatterns = [
     # Messaging
     path('messages/', views.chat_view, name='messaging_inbox'),
     path('messages/<int:user_id>/', views.chat_view, name='conversation'),
+    path('messages/<int:user_id>/older/', views.older_messages, name='older_messages'),
+    path('messages/<int:user_id>/read/', views.mark_messages_read, name='mark_messages_read'),
+    path('messages/stream/', views.message_stream, name='message_stream'),
     path('send-message/', views.send_message, name='send_message'),
+    path('users/search/', views.user_search, name='user_search'),
     
     # Organizer features
     path('organizer-dashboard/', views.organizer_dashboard, name='organizer_dashboard'),
     path('event/<int:event_id>/registrations/', views.event_registrations, name='event_registrations'),
+    path('event/<int:event_id>/registrations/export/', views.export_registrations, name='export_registrations'),
+    path('event/<int:event_id>/registrations/check-in/', views.bulk_check_in, name='bulk_check_in'),
+    path('event/<int:event_id>/registrations/attendance/', views.mark_attendance, name='mark_attendance'),
+    path('event/<int:event_id>/check-in/', views.checkin_scanner, name='checkin_scanner'),
+    path('event/<int:event_id>/report/', views.event_report, name='event_report'),
     path('event/new/', views.event_create, name='event_create'),
     path('event/<int:pk>/edit/', views.event_update, name='event_update'),
     path('event/<int:pk>/delete/', views.event_delete, name='event_delete'),
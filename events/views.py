@@ -4,48 +4,38 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import ListView, DetailView
-from django.db.models import Q, Max, Subquery, OuterRef
-from django.http import JsonResponse
+from django.core.exceptions import BadRequest, ValidationError
+from django.db import transaction
+from django.db.models import Q, Max, Subquery, OuterRef, Count, Sum
+from django.db.models.functions import Coalesce, Lower
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, Http404, StreamingHttpResponse
 from django.contrib.auth.views import LoginView
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+import asyncio
 import json
-from django.core.mail import send_mail
 from .models import Event, EventRegistration
-from .forms import RegistrationForm
+from .forms import registration_form_class
 from django.urls import reverse
+from django.utils.text import slugify
 
 
-from .models import User, Event, Category, EventRegistration, EventFeedback, Message, EventSuggestion, Certificate,  Registration, CustomField
+from .models import User, Event, Category, EventRegistration, EventFeedback, Message, EventSuggestion, Certificate,  Registration, CustomField, Conversation, WaitlistEntry, FIELD_TYPES
 from .forms import UserRegistrationForm, UserProfileForm, EventFeedbackForm, MessageForm, EventSuggestionForm, CertificateUploadForm, EventForm
-# Install: pip install openai
-# Add this function to views.py for real AI integration:
-
-import openai
-from django.conf import settings
-
-def generate_ai_summary_real(event, feedback):
-    openai.api_key = settings.OPENAI_API_KEY
-    
-    feedback_text = " ".join([f.comment for f in feedback])
-    
-    prompt = f"""
-    Generate a brief summary of the event "{event.title}" based on participant feedback:
-    
-    Event Description: {event.description}
-    Category: {event.category.name}
-    Participant Feedback: {feedback_text}
-    
-    Provide a 2-3 sentence summary highlighting key strengths and areas mentioned by participants.
-    """
-    
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=150
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"AI summary temporarily unavailable. Event focuses on {event.category.name}."
+from .search import search_events
+from .cache import get_home_events, get_categories, adjust_unread_count
+from .realtime import get_broker, publish_read_receipt
+from .outbox import enqueue_email
+from .checkin import checkin_qr, checkin_qr_attachment, scan
+from .schema import BUILTIN_FIELDS, apply_field_changes, fields_from_post
+from .answers import answer_filters, facet_counts, filter_by_answers, record_answers
+from .attendance import check_in_by_ids, check_in_from_csv
+from .rollups import organizer_trend
+from .summaries import summary_for
+from .reports import ATTENDED, DAY, RegistrantReport, report_dimensions
+from .exports import stream_csv, stream_xlsx, CSV_CONTENT_TYPE, XLSX_CONTENT_TYPE
+from .uploads import RegistrationUploadHandler, store_upload, upload_answer
+from .seats import reserve_seat, join_waitlist, leave_waitlist, waitlist_position, RESERVED, FULL, ALREADY_REGISTERED
 
 class CustomLoginView(LoginView):
     def get_success_url(self):
@@ -110,41 +100,36 @@ def register(request):
     })
 
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.utils import timezone
 
 @login_required
 def home(request):
     """Home page showing featured events"""
-    now = timezone.now()
-    five_hours_ago = now - timedelta(hours=5)
-
-    all_events = Event.objects.order_by('date')
-    
     category_name = request.GET.get('category_name')
-    selected_category = False
-
-    if category_name:
-        all_events = all_events.filter(category__name=category_name)
-        selected_category = True
-
-    # Filter events: upcoming OR completed within the last 5 hours
-    events = []
-    for event in all_events:
-        if event.status == 'upcoming' or event.status == 'ongoing':
-            events.append(event)
-        elif event.status == 'completed':
-            # Check if the event completed within the last 5 hours
-            event_end_time = event.start_time + timedelta(minutes=event.duration)
-            if event_end_time > five_hours_ago:
-                events.append(event)
-            
-    # Limit to 6 events
-    events = events[:6]
-    
-    categories = Category.objects.all()
+    selected_category = bool(category_name)
+
+    # Upcoming/ongoing events plus those completed within the last 5 hours, limited to 6.
+    # Both lists come from the signal-invalidated cache in events/cache.py.
+    events = get_home_events(category_name)
+    categories = get_categories()
     return render(request, 'events/home.html', {'events': events, 'categories': categories, 'selected_category': selected_category})
 
+def encode_cursor(moment, pk):
+    """Opaque keyset cursor for a (datetime, id) position."""
+    return f"{moment.isoformat()}~{pk}"
+
+def decode_cursor(cursor):
+    try:
+        moment, pk = cursor.rsplit('~', 1)
+        moment, pk = datetime.fromisoformat(moment), int(pk)
+    except ValueError:
+        raise BadRequest("Invalid cursor.")
+    # encode_cursor() always writes the UTC offset
+    if timezone.is_naive(moment):
+        raise BadRequest("Invalid cursor.")
+    return moment, pk
+
 class EventListView(LoginRequiredMixin, ListView):
     model = Event
     template_name = 'events/event_list.html'
@@ -152,26 +137,61 @@ class EventListView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        all_events = Event.objects.order_by('date')
-        queryset = [event for event in all_events if event.status == 'upcoming']
+        if self.top_rated:
+            # ?sort=top_rated: past events by average rating, optionally ?min_rating=N
+            try:
+                min_rating = float(self.request.GET['min_rating'])
+            except (KeyError, ValueError):
+                min_rating = None
+            queryset = Event.objects.top_rated(min_rating).select_related('category', 'organizer')
+        else:
+            queryset = Event.objects.upcoming().select_related('category', 'organizer').order_by('date', 'id')
         category_id = self.kwargs.get('category_id')
         if category_id:
-            queryset = [event for event in queryset if event.category.id == category_id]
+            queryset = queryset.filter(category_id=category_id)
 
         # Add search functionality
         query = self.request.GET.get('q')
         if query:
-            queryset = [event for event in queryset if query.lower() in event.title.lower() or query.lower() in event.description.lower()]
+            queryset = search_events(queryset, query)
             
         return queryset
+
+    @property
+    def top_rated(self):
+        return self.request.GET.get('sort') == 'top_rated'
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        ?page=N uses the regular LIMIT/OFFSET paginator. ?after=<cursor> switches
+        to keyset pagination on (date, id), so deep pages cost the same as the first.
+        """
+        if 'after' not in self.request.GET or self.top_rated:
+            return super().paginate_queryset(queryset, page_size)
+
+        queryset = queryset.order_by('date', 'id')
+        cursor = self.request.GET.get('after')
+        if cursor:
+            date, pk = decode_cursor(cursor)
+            queryset = queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk))
+
+        events = list(queryset[:page_size + 1])
+        has_next = len(events) > page_size
+        events = events[:page_size]
+        self.next_cursor = encode_cursor(events[-1].date, events[-1].pk) if has_next else None
+        return (None, None, events, False)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         category_id = self.kwargs.get('category_id')
         if category_id:
             context['category'] = get_object_or_404(Category, id=category_id)
+        context['next_cursor'] = getattr(self, 'next_cursor', None)
+        context['top_rated'] = self.top_rated
         return context
 
+FEEDBACK_SHOWN = 20
+
 class EventDetailView(LoginRequiredMixin, DetailView):
     model = Event
     template_name = 'events/event_detail.html'
@@ -185,41 +205,57 @@ class EventDetailView(LoginRequiredMixin, DetailView):
         context['start_time'] = event.start_time
 
         # ✅ Check if user is registered
-        is_registered = Registration.objects.filter(
+        registration = Registration.objects.filter(
             event=event, user=self.request.user
-        ).exists()
+        ).first()
+        is_registered = registration is not None
+        waitlist_entry = None if is_registered else WaitlistEntry.objects.filter(
+            event=event, user=self.request.user
+        ).first()
 
-        # ✅ Get feedback and suggestions
-        feedback = EventFeedback.objects.filter(event=event).order_by('-created_at')
+        # ✅ Get feedback and suggestions. The average and star histogram come from the
+        # event's rating aggregates, so only the latest comments are loaded
+        feedback = EventFeedback.objects.filter(event=event).select_related('participant').order_by('-created_at')[:FEEDBACK_SHOWN]
         suggestions = EventSuggestion.objects.filter(event=event).order_by('-created_at')
 
-        # ✅ AI Summary placeholder
-        ai_summary = self.generate_ai_summary(event, feedback)
+        # ✅ AI Summary: the last one generated in the background, never made during the request
+        ai_summary, ai_summary_pending = summary_for(event)
 
         # ✅ Update context
         context.update({
             'is_registered': is_registered,
+            # Door pass; shown until the holder has been checked in
+            'checkin_qr': checkin_qr(registration).svg_inline(scale=5) if is_registered and not registration.attended else None,
+            'waitlist_position': waitlist_position(waitlist_entry) if waitlist_entry else None,
             'feedback': feedback,
             'suggestions': suggestions,
             'ai_summary': ai_summary,
+            'ai_summary_pending': ai_summary_pending,
             'feedback_form': EventFeedbackForm(),
             'suggestion_form': EventSuggestionForm(),
         })
 
         return context
-    
-    def generate_ai_summary(self, event, feedback):
-        """Placeholder for AI summary generation"""
-        return f"This is an AI-generated summary for {event.title}. Based on participant feedback, this event focuses on {event.category.name} and has received positive reviews for its comprehensive content and engaging format."
 
 @login_required
+@csrf_exempt
 def register_for_event(request, event_id):
     """Register user for an event with dynamic fields including file uploads."""
     event = get_object_or_404(Event, id=event_id)
-
+    form_class = registration_form_class(event)
+    # Must be in place before anything reads the body (CSRF checks included, hence the exempt/protect pair)
+    upload_handler = RegistrationUploadHandler(form_class.schema, request)
+    request.upload_handlers = [upload_handler]
+    return _register_for_event(request, event, form_class, upload_handler)
+
+@csrf_protect
+def _register_for_event(request, event, form_class, upload_handler):
     if request.method == 'POST':
-        form = RegistrationForm(request.POST, request.FILES, event=event)
-        if form.is_valid():
+        form = form_class(request.POST, request.FILES)
+        is_valid = form.is_valid()
+        for label, error in upload_handler.errors.items():
+            form.add_error(label, error)
+        if is_valid and not upload_handler.errors:
             registration = Registration(
                 event=event,
                 user=request.user,
@@ -228,44 +264,68 @@ def register_for_event(request, event_id):
             )
 
             responses = {}
+            # Files are only stored once a registration or waitlist entry refers to them
+            uploads = []
 
-            for field in event.custom_fields.all():
+            for field in form_class.schema:
                 value = form.cleaned_data.get(field.label)
 
                 if field.field_type == 'file' and value:
-                    responses[field.label] = {
-                        'name': value.name,
-                        'url': value.url if hasattr(value, 'url') else ''
-                    }
+                    responses[field.label] = upload_answer(value, event.id)
+                    uploads.append((value, responses[field.label]))
+                    if not registration.uploaded_file:
+                        registration.uploaded_file.name = responses[field.label]['path']
                 else:
                     responses[field.label] = value
 
             registration.responses = responses
-            registration.save()
 
-            send_mail(
-                subject=f'Registration Confirmation for {event.title}',
-                message=f"""Hi {registration.name},
+            # The seat and the confirmation (through the outbox) commit together,
+            # so registering never waits on (or fails because of) SMTP.
+            with transaction.atomic():
+                outcome = reserve_seat(registration)
+                if outcome == RESERVED:
+                    record_answers(registration, form_class.schema)
+                    enqueue_email(
+                        subject=f'Registration Confirmation for {event.title}',
+                        body=f"""Hi {registration.name},
 
 Thank you for registering for {event.title}!
 
 📅 Date: {event.date.strftime('%A, %d %B %Y at %I:%M %p')}
 📍 Location: {event.location}
 
+Show the attached QR code at the door to check in.
+
 We look forward to seeing you!
 
 Best regards,
 Event Team
 """,
-                from_email='your_email@example.com',
-                recipient_list=[registration.email],
-                fail_silently=False,
-            )
-
-            messages.success(request, f'Registration successful! Confirmation sent to {registration.email}')
+                        to=[registration.email],
+                        attachments=[checkin_qr_attachment(registration)],
+                    )
+                    for uploaded, answer in uploads:
+                        store_upload(uploaded, answer)
+
+            if outcome == FULL:
+                entry = join_waitlist(registration)
+                # An existing entry (a repeat submit) keeps the answers it was queued with
+                if entry.responses == registration.responses:
+                    for uploaded, answer in uploads:
+                        store_upload(uploaded, answer)
+                messages.info(
+                    request,
+                    f'{event.title} is full. You are #{waitlist_position(entry)} on the waitlist '
+                    'and will be registered automatically when a seat opens up.'
+                )
+            elif outcome == ALREADY_REGISTERED:
+                messages.info(request, 'You are already registered for this event.')
+            else:
+                messages.success(request, f'Registration successful! A confirmation will be sent to {registration.email}')
             return redirect('event_detail', pk=event.id)
     else:
-        form = RegistrationForm(event=event)
+        form = form_class()
 
     return render(request, 'events/event_register_form.html', {'form': form, 'event': event})
 
@@ -354,89 +414,234 @@ def generate_cv(request):
 
 
 
+CHAT_WINDOW = 50
+
+def conversation_window(user, other_user, before=None, limit=CHAT_WINDOW):
+    """
+    The latest `limit` messages between two users, oldest first, optionally only
+    those before a (timestamp, id) cursor. Each direction is read separately so
+    both walk message_pair_time_idx, then the two pages are merged.
+    """
+    window = []
+    for sender, receiver in ((user, other_user), (other_user, user)):
+        messages_qs = Message.objects.filter(sender=sender, receiver=receiver)
+        if before:
+            timestamp, pk = before
+            messages_qs = messages_qs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+        window += messages_qs.order_by('-timestamp', '-id')[:limit + 1]
+
+    window.sort(key=lambda message: (message.timestamp, message.id), reverse=True)
+    has_more = len(window) > limit
+    window = window[:limit]
+    window.reverse()
+    return window, has_more
+
+def mark_window_read(user, other_user, window):
+    """Mark read only the messages from `other_user` that `user` is actually shown."""
+    unread_ids = [m.id for m in window if m.sender_id == other_user.id and not m.is_read]
+    if not unread_ids:
+        return
+    with transaction.atomic():
+        marked = Message.objects.filter(id__in=unread_ids, is_read=False).update(is_read=True)
+        if marked:
+            Conversation.mark_read(user.id, other_user.id, marked)
+            transaction.on_commit(lambda: adjust_unread_count(user.id, -marked))
+            transaction.on_commit(lambda: publish_read_receipt(user.id, other_user.id, unread_ids))
+
 @login_required
 def chat_view(request, user_id=None):
     """
     Main chat view that handles both the conversation list and the active chat.
     """
     user = request.user
-    
-    # Get all users the current user has had a conversation with
-    q_filter = Q(sender=user) | Q(receiver=user)
-    messaged_user_ids = Message.objects.filter(q_filter).values_list('sender_id', 'receiver_id')
-    messaged_user_ids = {uid for t in messaged_user_ids for uid in t if uid != user.id}
-    
-    # For participants, also get organizers of events they are registered for
-    if user.user_type == 'participant':
-        registered_events = Registration.objects.filter(user=user).select_related('event__organizer')
-        organizer_ids = {reg.event.organizer.id for reg in registered_events}
-        messaged_user_ids.update(organizer_ids)
-
-    conversations = User.objects.filter(id__in=messaged_user_ids)
-
-    # Annotate with the last message for sorting and display
-    # Find the latest message (either sent or received) for each conversation
-    latest_message_subquery = Message.objects.filter(
-        Q(sender=OuterRef('pk'), receiver=user) |
-        Q(sender=user, receiver=OuterRef('pk'))
-    ).order_by('-timestamp')
-
-    conversations = conversations.annotate(
-        last_message_id=Subquery(latest_message_subquery.values('id')[:1]),
-        last_message_time=Subquery(latest_message_subquery.values('timestamp')[:1])
-    ).order_by('-last_message_time')
-
-    # Fetch the actual last message objects
-    # This requires another query or iterating and fetching,
-    # but for simplicity, we'll attach it in a loop for now.
-    # A more optimized way would be to use a Prefetch object if the relationship was direct.
-    for conv_user in conversations:
-        if conv_user.last_message_id:
-            conv_user.last_message = Message.objects.get(id=conv_user.last_message_id)
-        else:
-            conv_user.last_message = None
 
     active_conversation = None
     other_user = None
+    older_cursor = None
 
     if user_id:
         other_user = get_object_or_404(User, id=user_id)
-        active_conversation = Message.objects.filter(
-            (Q(sender=user) & Q(receiver=other_user)) |
-            (Q(sender=other_user) & Q(receiver=user))
-        ).order_by('timestamp')
-        
-        # Mark messages as read
-        Message.objects.filter(sender=other_user, receiver=user, is_read=False).update(is_read=True)
+        active_conversation, has_more = conversation_window(user, other_user)
+        if has_more:
+            oldest = active_conversation[0]
+            older_cursor = encode_cursor(oldest.timestamp, oldest.id)
+        mark_window_read(user, other_user, active_conversation)
+
+    # The inbox comes from the Conversation table: one indexed query however
+    # many conversations the user has.
+    conversations = []
+    for conversation in Conversation.objects.for_user(user):
+        conv_user = conversation.other_user(user)
+        conv_user.last_message_snippet = conversation.last_message_snippet
+        conv_user.unread_count = conversation.unread_for(user)
+        conversations.append(conv_user)
+
+    # For participants, also list organizers of events they are registered for
+    if user.user_type == 'participant':
+        organizer_ids = set(
+            Registration.objects.filter(user=user).values_list('event__organizer_id', flat=True)
+        )
+        organizer_ids -= {conv_user.id for conv_user in conversations}
+        organizer_ids.discard(user.id)
+        for organizer in User.objects.filter(id__in=organizer_ids):
+            organizer.last_message_snippet = ''
+            organizer.unread_count = 0
+            conversations.append(organizer)
 
     context = {
         'conversations': conversations,
         'other_user': other_user,
         'conversation': active_conversation,
+        'older_cursor': older_cursor,
         'message_form': MessageForm(sender=user),
     }
     return render(request, 'events/messaging.html', context)
 
+@login_required
+def older_messages(request, user_id):
+    """
+    JSON page of messages older than ?before=<cursor>, for chat_view's "load older".
+    Without a cursor it returns the latest page; a malformed one is a 400.
+    """
+    other_user = get_object_or_404(User, id=user_id)
+    cursor = request.GET.get('before')
+    before = decode_cursor(cursor) if cursor else None
+    window, has_more = conversation_window(request.user, other_user, before=before)
+    mark_window_read(request.user, other_user, window)
+
+    oldest = window[0] if window else None
+    return JsonResponse({
+        'messages': [
+            {
+                'id': message.id,
+                'sender_id': message.sender_id,
+                'content': message.content,
+                'timestamp': message.timestamp.isoformat(),
+            }
+            for message in window
+        ],
+        'before': encode_cursor(oldest.timestamp, oldest.id) if has_more else None,
+    })
+
 
 @login_required
 def send_message(request):
-    """Send a message"""
+    """Send a message. Chat pages post with Accept: application/json and get the id back."""
+    wants_json = request.headers.get('Accept') == 'application/json'
     if request.method == 'POST':
         form = MessageForm(request.POST, sender=request.user)
         if form.is_valid():
             message = form.save(commit=False)
             message.sender = request.user
             message.save()
+            if wants_json:
+                return JsonResponse({'id': message.id})
             messages.success(request, 'Message sent successfully!')
             # Redirect to the conversation with the receiver
-            return redirect('conversation', user_id=message.receiver.id)
+            return redirect('conversation', user_id=message.receiver_id)
         else:
+            if wants_json:
+                return JsonResponse({'errors': form.errors}, status=400)
             messages.error(request, 'Error sending message.')
             # Redirect back to the inbox or a relevant page
             return redirect('messaging_inbox')
     
     return redirect('messaging_inbox')
 
+@login_required
+def mark_messages_read(request, user_id):
+    """Mark pushed messages read while their conversation is open (POST ids=...)."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    other_user = get_object_or_404(User, id=user_id)
+    ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()]
+    window = Message.objects.filter(id__in=ids, sender=other_user, receiver=request.user)
+    mark_window_read(request.user, other_user, list(window))
+    return JsonResponse({'ok': True})
+
+SSE_KEEPALIVE_SECONDS = 25
+
+@login_required
+async def message_stream(request):
+    """
+    Server-Sent Events stream of new messages and read receipts for the current
+    user. Only served by the ASGI app (e.g. `uvicorn event_networking.asgi:application`).
+    Under WSGI the async generator would be buffered to the end, sending nothing
+    while pinning a worker thread, so it answers 204 instead. EventSource takes
+    that as "don't reconnect", and the chat page falls back to plain form posts.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+
+    async def events():
+        async with get_broker().subscribe(user.id) as queue:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+RECEIVER_SEARCH_LIMIT = 10
+RECEIVER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+# Sorts after every string that starts with the prefix, including characters outside the BMP
+PREFIX_RANGE_END = chr(0x10FFFF)
+
+def search_receivers(sender, prefix, limit=RECEIVER_SEARCH_LIMIT):
+    """
+    Up to `limit` users whose username, first or last name starts with `prefix`
+    (case-insensitive). People the sender already talks to, and organizers of
+    events they registered for, come first.
+    """
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+
+    users = User.objects.exclude(id=sender.id).annotate(
+        **{f'{field}_lower': Lower(field) for field in RECEIVER_NAME_FIELDS}
+    )
+
+    # A range on the lowercased value can walk the Lower() indexes on User
+    def starts_with(field):
+        return Q(**{f'{field}_lower__gte': prefix, f'{field}_lower__lt': prefix + PREFIX_RANGE_END})
+
+    any_name = starts_with('username') | starts_with('first_name') | starts_with('last_name')
+    known = (
+        Q(id__in=Conversation.objects.filter(user_low=sender).values('user_high')) |
+        Q(id__in=Conversation.objects.filter(user_high=sender).values('user_low')) |
+        Q(id__in=Registration.objects.filter(user=sender).values('event__organizer'))
+    )
+
+    results = list(users.filter(known, any_name).order_by('username')[:limit])
+    seen = {user.id for user in results}
+    for field in RECEIVER_NAME_FIELDS:
+        if len(results) >= limit:
+            break
+        for user in users.filter(starts_with(field)).order_by(f'{field}_lower')[:limit]:
+            if user.id not in seen:
+                seen.add(user.id)
+                results.append(user)
+    return results[:limit]
+
+@login_required
+def user_search(request):
+    """Typeahead for the message receiver picker: ?q=<prefix>."""
+    users = search_receivers(request.user, request.GET.get('q', ''))
+    return JsonResponse({
+        'results': [
+            {'id': user.id, 'username': user.username, 'name': user.get_full_name()}
+            for user in users
+        ]
+    })
+
 @login_required
 def add_feedback(request, event_id):
     """Add feedback for an event"""
@@ -453,7 +658,9 @@ def add_feedback(request, event_id):
             feedback = form.save(commit=False)
             feedback.event = event
             feedback.participant = request.user
-            feedback.save()
+            # The event's rating aggregates are updated by signal in the same transaction
+            with transaction.atomic():
+                feedback.save()
             messages.success(request, 'Feedback submitted successfully!')
         else:
             messages.error(request, 'Error submitting feedback.')
@@ -478,6 +685,8 @@ def add_suggestion(request, event_id):
     
     return redirect('event_detail', pk=event.id)
 
+DASHBOARD_TREND_DAYS = 30
+
 @login_required
 def organizer_dashboard(request):
     """Dashboard for organizers"""
@@ -485,16 +694,27 @@ def organizer_dashboard(request):
         messages.error(request, 'Access denied. Organizers only.')
         return redirect('home')
     
-    events = Event.objects.filter(organizer=request.user).order_by('-created_at')
-    upcoming_events_count = len([event for event in events if event.status == 'upcoming'])
-    completed_events_count = len([event for event in events if event.status == 'completed'])
-    total_registrations = sum(event.registered_count for event in events)
-    
+    # Three queries however many events: the list, one aggregate for the
+    # statistics, and the trend from the daily rollups (see rollups.py)
+    events = Event.objects.filter(organizer=request.user).select_related('category').order_by('-created_at')
+    now = timezone.now()
+    totals = Event.objects.filter(organizer=request.user).aggregate(
+        events_count=Count('id'),
+        upcoming_events_count=Count('id', filter=Q(start_time__gt=now)),
+        completed_events_count=Count('id', filter=Q(end_time__lt=now)),
+        total_registrations=Coalesce(Sum('registered_count'), 0),
+    )
+    trend = organizer_trend(request.user, days=DASHBOARD_TREND_DAYS)
+    peak = max((day['registrations'] for day in trend), default=0)
+
     context = {
         'events': events,
-        'upcoming_events_count': upcoming_events_count,
-        'completed_events_count': completed_events_count,
-        'total_registrations': total_registrations,
+        **totals,
+        'trend': trend,
+        'trend_peak': peak,
+        'trend_totals': {
+            field: sum(day[field] for day in trend) for field in ('registrations', 'cancellations', 'attendances')
+        },
     }
     return render(request, 'events/organizer_dashboard.html', context)
 
@@ -507,61 +727,215 @@ def event_registrations(request, event_id):
         messages.error(request, 'Access denied.')
         return redirect('home')
     
-    registrations = Registration.objects.filter(event=event).order_by('-registered_at')
-    
+    # Filters and facet counts run on the indexed answer table, not on responses JSON
+    schema = registration_form_class(event).schema
+    filters = answer_filters(request.GET, schema)
+    registrations = filter_by_answers(
+        Registration.objects.filter(event=event).select_related('user'), event, filters
+    ).order_by('-registered_at')
+    counts = facet_counts(event, registrations if filters else None)
+
+    def with_filters(new_filters):
+        params = request.GET.copy()
+        params.setlist('answer', [f'{field_id}:{value}' for field_id, value in new_filters])
+        return '?' + params.urlencode()
+
+    facets = []
+    for field in schema:
+        if field.field_type == 'file' or field.pk not in counts:
+            continue
+        values = []
+        for value, count in counts[field.pk]:
+            selected = (field.pk, value) in filters
+            toggled = [f for f in filters if f != (field.pk, value)] if selected else filters + [(field.pk, value)]
+            values.append({'value': value, 'count': count, 'selected': selected, 'url': with_filters(toggled)})
+        facets.append((field.label, values))
+
+    labels = {field.pk: field.label for field in schema}
+    active_filters = [
+        (labels[field_id], value, with_filters([f for f in filters if f != (field_id, value)]))
+        for field_id, value in filters
+    ]
+
     context = {
         'event': event,
         'registrations': registrations,
+        'facets': facets,
+        'active_filters': active_filters,
     }
     return render(request, 'events/event_registrations.html', context)
 
-BUILTIN_FIELDS = {
-    "Phone Number": "text",
-    "College Name": "text",
-    "Department": "text",
-    "Year of Study": "number",
-    "ID Card": "file",
+@login_required
+def bulk_check_in(request, event_id):
+    """Mark attendees from an uploaded CSV of emails or usernames (organizers only)"""
+    event = get_object_or_404(Event, id=event_id)
+
+    if event.organizer != request.user:
+        messages.error(request, 'Access denied.')
+        return redirect('home')
+
+    if request.method == 'POST':
+        csv_file = request.FILES.get('attendees')
+        if not csv_file:
+            messages.error(request, 'Choose a CSV file to import.')
+        else:
+            summary = check_in_from_csv(event, csv_file)
+            messages.success(
+                request,
+                f"Checked in {summary['matched']} attendees "
+                f"({summary['already_attended']} were already checked in, {summary['unmatched']} rows not matched)."
+            )
+            if summary['unmatched']:
+                messages.warning(request, 'Not matched: ' + ', '.join(map(str, summary['unmatched_sample'])))
+
+    return redirect('event_registrations', event_id=event.id)
+
+@login_required
+def mark_attendance(request, event_id):
+    """JSON: {"registration_ids": [...]} -> check-in summary (organizers only)"""
+    event = get_object_or_404(Event, id=event_id)
+
+    if event.organizer != request.user:
+        return JsonResponse({'error': 'Access denied.'}, status=403)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+
+    try:
+        registration_ids = json.loads(request.body)['registration_ids']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"registration_ids": [...]}'}, status=400)
+    if not isinstance(registration_ids, list):
+        return JsonResponse({'error': 'registration_ids must be a list'}, status=400)
+
+    return JsonResponse(check_in_by_ids(event, registration_ids))
+
+@login_required
+def checkin_scanner(request, event_id):
+    """Door scanner page; its scans are POSTed as JSON {"token": ...} to the same URL (organizers only)"""
+    event_id = int(event_id)
+    if request.method == 'POST':
+        if request.user.user_type != 'organizer':
+            return JsonResponse({'error': 'Access denied.'}, status=403)
+        try:
+            token = json.loads(request.body)['token']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'Expected {"token": ...}'}, status=400)
+        # No event lookup here: scan() checks ownership inside its UPDATE
+        status, name = scan(str(token), event_id, request.user.id)
+        return JsonResponse({'status': status, 'name': name})
+
+    event = get_object_or_404(Event, id=event_id)
+    if event.organizer != request.user:
+        messages.error(request, 'Access denied.')
+        return redirect('home')
+    return render(request, 'events/checkin_scanner.html', {'event': event})
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, CSV_CONTENT_TYPE),
+    'xlsx': (stream_xlsx, XLSX_CONTENT_TYPE),
 }
+
+@login_required
+def export_registrations(request, event_id):
+    """Download an event's registrants as CSV or XLSX (?format=xlsx), streamed row by row."""
+    event = get_object_or_404(Event, id=event_id)
+
+    if event.organizer != request.user:
+        messages.error(request, 'Access denied.')
+        return redirect('home')
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise Http404('Unknown export format')
+    stream, content_type = EXPORT_FORMATS[export_format]
+
+    response = StreamingHttpResponse(stream(event), content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{slugify(event.title) or event.id}_registrations.{export_format}"'
+    )
+    return response
+
+@login_required
+def event_report(request, event_id):
+    """
+    Registrant breakdowns: a ?rows= by ?columns= cross-tab, attendance rates
+    per row and the fill curve. ?format=json returns the same data.
+    """
+    event = get_object_or_404(Event, id=event_id)
+
+    if event.organizer != request.user:
+        messages.error(request, 'Access denied.')
+        return redirect('home')
+
+    dimensions = report_dimensions(event.custom_fields.order_by('id'))
+    keys = {str(key): key for key, label in dimensions}
+    rows = keys.get(request.GET.get('rows'), DAY)
+    columns = keys.get(request.GET.get('columns'), ATTENDED)
+
+    report = RegistrantReport(event)
+    data = {
+        'registrations': len(report),
+        'attended': int(report.attended.sum()),
+        'cross_tab': report.cross_tab(rows, columns),
+        'attendance_rates': report.attendance_rates(rows),
+        'fill_curve': report.fill_curve(),
+    }
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'event': event.id, 'rows': rows, 'columns': columns, **data})
+
+    cross_tab = data['cross_tab']
+    rates = data['attendance_rates']
+    fill = data['fill_curve']
+    return render(request, 'events/event_report.html', {
+        'event': event,
+        'dimensions': dimensions,
+        'rows': rows,
+        'columns': columns,
+        'registrations': data['registrations'],
+        'attended': data['attended'],
+        'cross_tab': cross_tab,
+        'cross_tab_rows': zip(cross_tab['rows'], cross_tab['counts'], cross_tab['row_totals']),
+        'rates': zip(rates['labels'], rates['registered'], rates['attended'], [rate * 100 for rate in rates['rates']]),
+        'fill_curve': zip(
+            fill['days'], fill['registered'],
+            [fraction * 100 for fraction in fill['fill']] if fill['fill'] is not None else [None] * len(fill['days']),
+        ),
+    })
+
+def custom_field_context(event=None):
+    """Built-in checkboxes and editable custom rows for events/event_form.html."""
+    fields = list(event.custom_fields.order_by('id')) if event else []
+    chosen = {field.label for field in fields}
+    return {
+        'builtin_fields': [(label, label in chosen) for label in BUILTIN_FIELDS],
+        'custom_fields': [field for field in fields if field.label not in BUILTIN_FIELDS],
+        'field_types': FIELD_TYPES,
+    }
+
 @login_required
 def event_create(request):
     if request.method == 'POST':
         form = EventForm(request.POST, request.FILES)
         if form.is_valid():
-            event = form.save(commit=False)  # Don't save to DB yet
-            event.organizer = request.user   # Assign the logged-in user
-            event.save()     
-
-            # 1. Save built-in fields (checkboxes)
-            for field_label, field_type in BUILTIN_FIELDS.items():
-                if request.POST.get(field_label):  # checkbox ticked
-                    CustomField.objects.create(
-                        event=event,
-                        label=field_label,
-                        field_type=field_type,
-                        required=True  # these are always required if chosen
-                    )
-
-            # 2. Save extra custom fields
-            custom_labels = request.POST.getlist('custom_label[]')
-            custom_types = request.POST.getlist('custom_type[]')
-            custom_required = request.POST.getlist('custom_required[]')
-
-            for label, ftype, req in zip(custom_labels, custom_types, custom_required):
-                if label.strip():
-                    CustomField.objects.create(
-                        event=event,
-                        label=label,
-                        field_type=ftype,
-                        required=(req == 'on')
-                    )
-
-            return redirect('event_list')
+            try:
+                field_specs = fields_from_post(request.POST)
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                with transaction.atomic():
+                    event = form.save(commit=False)  # Don't save to DB yet
+                    event.organizer = request.user   # Assign the logged-in user
+                    event.save()
+                    apply_field_changes(event, field_specs)
+
+                return redirect('event_list')
     else:
         form = EventForm()
 
     return render(request, 'events/event_form.html', {
         'form': form,
-        'builtin_fields': BUILTIN_FIELDS
+        'action': 'create',
+        **custom_field_context(),
     })
 
 @login_required
@@ -575,37 +949,26 @@ def event_update(request, pk):
     if request.method == 'POST':
         form = EventForm(request.POST, request.FILES, instance=event)
         if form.is_valid():
-            event = form.save()
-
-            # --- Handle Custom Fields ---
-            event.custom_fields.all().delete()
-
-            labels = request.POST.getlist('custom_label[]')
-            types = request.POST.getlist('custom_type[]')
-            required_flags = request.POST.getlist('custom_required[]')
-
-            for i in range(len(labels)):
-                label = labels[i].strip()
-                field_type = types[i].strip() if i < len(types) else 'text'
-                required = i < len(required_flags) and required_flags[i] == 'on'
-
-                if label:
-                    CustomField.objects.create(
-                        event=event,
-                        label=label,
-                        field_type=field_type,
-                        required=required
-                    )
-
-            messages.success(request, 'Event updated successfully!')
-            return redirect('organizer_dashboard')
+            try:
+                field_specs = fields_from_post(request.POST)
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                # Existing fields are matched by id and edited in place, so answers stay attached
+                with transaction.atomic():
+                    event = form.save()
+                    apply_field_changes(event, field_specs)
+
+                messages.success(request, 'Event updated successfully!')
+                return redirect('organizer_dashboard')
     else:
         form = EventForm(instance=event)
 
     return render(request, 'events/event_form.html', {
         'form': form,
         'action': 'update',
-        'event': event
+        'event': event,
+        **custom_field_context(event),
     })
 
 @login_required
@@ -631,11 +994,15 @@ def cancel_registration(request, event_id):
     event = get_object_or_404(Event, pk=event_id)
 
     try:
+        # The freed seat goes to the head of the waitlist in the same transaction (signals.py)
         registration = Registration.objects.get(event=event, user=request.user)
         registration.delete()
         messages.success(request, f'You have cancelled your registration for {event.title}.')
     except Registration.DoesNotExist:
-        messages.warning(request, 'You were not registered for this event.')
+        if leave_waitlist(event.id, request.user.id):
+            messages.success(request, f'You have left the waitlist for {event.title}.')
+        else:
+            messages.warning(request, 'You were not registered for this event.')
 
     # ✅ Redirect back to event detail page
     return redirect('event_detail', pk=event.id)